@@ -1,8 +1,16 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 import uvicorn
+import aiofiles
+import asyncio
+import functools
+import hashlib
+import time
 from typing import Optional, Dict
 import os
 import json
@@ -11,11 +19,17 @@ from datetime import datetime
 from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
-from src.video_processor import get_video_info, extract_frames
-from src.object_tracking import ObjectTracker
-from src.audio_processing import extract_audio, AudioTranscriber
-from src.scene_understanding import SceneAnalyzer
-from src.data_integration import VideoAnalysisIntegrator
+from src.adaptive_sampling import DEFAULT_MAX_SAMPLE_RATE, DEFAULT_MIN_SAMPLE_RATE
+from src.data_integration import load_results, read_results, select_results
+from src.detection_store import DetectionStore
+from src.frame_index import SEARCH_MODES, FrameIndex
+from src.job_store import JobStore
+from src.timeline_index import DEFAULT_WINDOW_KINDS, TimelineIndex
+from src.transcript_index import TranscriptIndex
+from src.model_registry import registry
+from src.worker import WorkerPool
+from src.uploads import commit_upload, file_sha256, is_sha256, lock_part
+from src.whisper_profiles import WHISPER_PROFILES
 
 app = FastAPI(title="Video Content Analyzer API", version="1.0.0")
 app.add_middleware(
@@ -29,30 +43,45 @@ UPLOAD_DIR = Path("data/uploads")
 OUTPUT_DIR = Path("outputs/api_results")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-job_status: Dict[str, dict] = {}
+JOB_DB = os.getenv("JOB_DB", "data/jobs.db")
+SAVE_KEYFRAMES = os.getenv("SAVE_KEYFRAMES", "1") == "1"
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "0") == "1"
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", "1"))
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "20"))
+MAX_VIDEO_SIZE_MB = int(os.getenv("MAX_VIDEO_SIZE_MB", "500"))
+MAX_UPLOAD_BYTES = MAX_VIDEO_SIZE_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Resumable uploads that receive nothing for this long are dropped along with their part files
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+# Must be the clip_model jobs are analyzed with, queries are embedded in that model's space
+SEARCH_CLIP_MODEL = os.getenv("SEARCH_CLIP_MODEL", "ViT-B/32")
+# Jobs whose parsed results stay in memory for repeated /results and /window requests
+RESULTS_CACHE_SIZE = int(os.getenv("RESULTS_CACHE_SIZE", "8"))
+# How often an open /events stream checks for new events, and sends a comment to keep idle connections open
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "0.5"))
+EVENTS_KEEPALIVE_SECONDS = 15.0
+# Events read from the job store per query
+EVENTS_BATCH_SIZE = 500
+jobs = JobStore(JOB_DB)
+worker_pool = WorkerPool(JOB_DB, str(OUTPUT_DIR), num_workers=NUM_WORKERS, warmup=WARMUP_MODELS)
+frame_index = FrameIndex(model_name=SEARCH_CLIP_MODEL)
+transcript_index = TranscriptIndex()
 
-def video_has_audio(video_path: str) -> bool:
-    import subprocess
-    try:
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-select_streams', 'a:0',
-            '-show_entries', 'stream=codec_type',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.stdout.strip() == 'audio'
-    except:
-        return False
 class JobStatus(BaseModel):
     job_id: str
-    status: str  # "pending", "processing", "completed", "failed"
+    status: str  # "pending", "queued", "processing", "completed", "failed"
     progress: int  # 0-100
     message: str
     result_path: Optional[str] = None
     error: Optional[str] = None
+    queue_position: Optional[int] = None
+@app.on_event("startup")
+def start_workers():
+    expire_upload_sessions()
+    worker_pool.start()
+@app.on_event("shutdown")
+def stop_workers():
+    worker_pool.stop()
 @app.get("/")
 def read_root():
     """Health check endpoint."""
@@ -61,155 +90,414 @@ def read_root():
         "message": "Video Content Analyzer API",
         "version": "1.0.0"
     }
+def create_job(filename: str, file_path: Path, content_hash: str) -> str:
+    job_id = str(uuid.uuid4())
+    jobs.create({
+        "job_id": job_id,
+        "status": "pending",
+        "progress": 0,
+        "message": "Video uploaded successfully",
+        "filename": filename,
+        "upload_time": datetime.now().isoformat(),
+        "file_path": str(file_path),
+        "content_hash": content_hash
+    })
+    return job_id
 @app.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
     if not file.content_type.startswith("video/"):
         raise HTTPException(400, "File must be a video")
-    job_id = str(uuid.uuid4())
-    file_path = UPLOAD_DIR / f"{job_id}_{file.filename}"
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"Video exceeds the {MAX_VIDEO_SIZE_MB} MB limit")
+    temp_path = UPLOAD_DIR / f"{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+    size = 0
     try:
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        # Stream in fixed-size chunks so memory per upload stays bounded by UPLOAD_CHUNK_SIZE
+        async with aiofiles.open(temp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(413, f"Video exceeds the {MAX_VIDEO_SIZE_MB} MB limit")
+                digest.update(chunk)
+                await f.write(chunk)
+        file_path, deduplicated = commit_upload(temp_path, UPLOAD_DIR, digest.hexdigest(), file.filename)
+    except HTTPException:
+        temp_path.unlink(missing_ok=True)
+        raise
     except Exception as e:
+        temp_path.unlink(missing_ok=True)
         raise HTTPException(500, f"Failed to save file: {str(e)}")
-    job_status[job_id] = {
+    job_id = create_job(file.filename, file_path, digest.hexdigest())
+    return {
         "job_id": job_id,
-        "status": "pending",
-        "progress": 0,
-        "message": "Video uploaded successfully",
-        "filename": file.filename,
-        "upload_time": datetime.now().isoformat(),
-        "file_path": str(file_path)
+        "content_hash": digest.hexdigest(),
+        "deduplicated": deduplicated,
+        "message": "Video uploaded successfully. Use /process/{job_id} to start analysis."
     }
+# Sessions are judged by the last write to their part file, so a slow upload that is still
+# progressing survives; runs at startup and whenever a new session starts
+def expire_upload_sessions() -> int:
+    cutoff = time.time() - UPLOAD_SESSION_TTL_HOURS * 3600
+    expired = 0
+    for upload in jobs.uploads_created_before(cutoff):
+        temp_path = Path(upload["temp_path"])
+        if temp_path.exists():
+            if temp_path.stat().st_mtime >= cutoff:
+                continue
+            with lock_part(str(temp_path)) as locked:
+                if not locked:
+                    continue
+                temp_path.unlink(missing_ok=True)
+        jobs.delete_upload(upload["upload_id"])
+        expired += 1
+    if expired:
+        print(f"Expired {expired} abandoned upload session(s)")
+    return expired
+class UploadSession(BaseModel):
+    filename: str
+    size: int
+    content_hash: Optional[str] = None  # sha256 of the file, checked against the received bytes on completion
+@app.post("/uploads")
+def start_upload(session: UploadSession):
+    if session.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"Video exceeds the {MAX_VIDEO_SIZE_MB} MB limit")
+    if session.content_hash and not is_sha256(session.content_hash.lower()):
+        raise HTTPException(400, "content_hash must be a hex sha256 digest")
+    # A declared hash is no proof of holding the file, so stored copies are only reused at
+    # /complete, once the bytes have been received and hashed
+    expire_upload_sessions()
+    upload_id = str(uuid.uuid4())
+    temp_path = UPLOAD_DIR / f"{upload_id}.part"
+    temp_path.touch()
+    jobs.create_upload({
+        "upload_id": upload_id,
+        "filename": session.filename,
+        "size": session.size,
+        "content_hash": session.content_hash.lower() if session.content_hash else None,
+        "temp_path": str(temp_path),
+        "created_at": time.time()
+    })
+    return {"upload_id": upload_id, "offset": 0, "chunk_size": UPLOAD_CHUNK_SIZE}
+def get_upload_session(upload_id: str) -> dict:
+    upload = jobs.get_upload(upload_id)
+    if upload is None or not os.path.exists(upload["temp_path"]):
+        raise HTTPException(404, "Upload ID not found")
+    return upload
+@app.get("/uploads/{upload_id}")
+def upload_status(upload_id: str):
+    upload = get_upload_session(upload_id)
+    return {"upload_id": upload_id, "offset": os.path.getsize(upload["temp_path"]), "size": upload["size"]}
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int):
+    upload = get_upload_session(upload_id)
+    with lock_part(upload["temp_path"]) as locked:
+        if not locked:
+            raise HTTPException(409, "Another chunk of this upload is being written")
+        # Read under the lock, so a second request with the same offset sees the first one's bytes
+        current = os.path.getsize(upload["temp_path"])
+        # Chunks must arrive in order; a client resuming after a failure asks GET /uploads/{id} for the offset
+        if offset != current:
+            raise HTTPException(409, f"Expected offset {current}")
+        written = 0
+        async with aiofiles.open(upload["temp_path"], "ab") as f:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if current + written > upload["size"]:
+                    await f.truncate(current)
+                    raise HTTPException(413, "Chunk goes past the declared upload size")
+                await f.write(chunk)
+    return {"upload_id": upload_id, "offset": current + written}
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    upload = get_upload_session(upload_id)
+    temp_path = Path(upload["temp_path"])
+    with lock_part(str(temp_path)) as locked:
+        if not locked:
+            raise HTTPException(409, "A chunk of this upload is still being written")
+        if temp_path.stat().st_size != upload["size"]:
+            raise HTTPException(400, f"Upload incomplete: {temp_path.stat().st_size} of {upload['size']} bytes")
+        content_hash = await run_in_threadpool(file_sha256, str(temp_path), UPLOAD_CHUNK_SIZE)
+        if upload["content_hash"] and upload["content_hash"] != content_hash:
+            raise HTTPException(400, "Content hash mismatch, upload is corrupted")
+        file_path, deduplicated = commit_upload(temp_path, UPLOAD_DIR, content_hash, upload["filename"])
+        jobs.delete_upload(upload_id)
+    job_id = create_job(upload["filename"], file_path, content_hash)
     return {
         "job_id": job_id,
+        "content_hash": content_hash,
+        "deduplicated": deduplicated,
         "message": "Video uploaded successfully. Use /process/{job_id} to start analysis."
     }
-def process_video_task(job_id: str):
-    try:
-        job = job_status[job_id]
-        video_path = job["file_path"]
-        job["status"] = "processing"
-        job["progress"] = 5
-        job["message"] = "Starting analysis"
-        job_output_dir = OUTPUT_DIR / job_id
-        job_output_dir.mkdir(exist_ok=True)
-        frames_dir = job_output_dir / "frames"
-        frames_dir.mkdir(exist_ok=True)
-        integrator = VideoAnalysisIntegrator()
-        job["progress"] = 10
-        job["message"] = "Extracting video metadata"
-        video_info = get_video_info(video_path)
-        integrator.add_video_metadata(video_info)
-        job["progress"] = 20
-        job["message"] = "Extracting frames"
-        frame_paths = extract_frames(video_path, str(frames_dir), sample_rate=1.0)
-        job["progress"] = 35
-        job["message"] = "Running object detection and tracking..."
-        tracker = ObjectTracker(model_name='yolov8n.pt', confidence_threshold=0.5)
-        tracking_results = tracker.track_in_frames(frame_paths)
-        integrator.add_frame_detections(frame_paths, tracking_results)
-        integrator.compute_tracks_summary()
-        job["progress"] = 60
-        job["message"] = "Transcribing audio"
-        if video_has_audio(video_path):
-            job["message"] = "Extracting and transcribing audio..."
-            audio_path = job_output_dir / "audio.wav"
-            try:
-                extract_audio(video_path, str(audio_path))
-                transcriber = AudioTranscriber(model_name='base')
-                transcript = transcriber.transcribe(str(audio_path))
-                integrator.add_audio_transcript(transcript)
-                os.remove(audio_path)  # Cleanup
-            except Exception as e:
-                job["message"] = f"Audio processing failed: {str(e)}, continuing without audio..."
-                integrator.add_audio_transcript({
-                    'language': 'none',
-                    'text': '',
-                    'segments': []
-                })
-        else:
-            job["message"] = "No audio stream detected, skipping transcription..."
-            integrator.add_audio_transcript({
-                'language': 'none',
-                'text': '',
-                'segments': []
-            })
-        job["progress"] = 80
-        job["message"] = "Analyzing scenes with CLIP"
-        analyzer = SceneAnalyzer(model_name="ViT-B/32")
-        scenes = analyzer.analyze_scenes(frame_paths, scene_threshold=30.0)
-        integrator.add_scenes(scenes)
-        job["progress"] = 90
-        job["message"] = "Generating summary"
-        integrator.generate_summary()
-        job["progress"] = 95
-        job["message"] = "Exporting results"
-        result_path = job_output_dir / "analysis_results.json"
-        integrator.export_json(str(result_path))
-        job["status"] = "completed"
-        job["progress"] = 100
-        job["message"] = "Analysis complete!"
-        job["result_path"] = str(result_path)
-        job["completion_time"] = datetime.now().isoformat()
-    except Exception as e:
-        job["status"] = "failed"
-        job["error"] = str(e)
-        job["message"] = f"Analysis failed: {str(e)}"
+class ProcessOptions(BaseModel):
+    sample_rate: Optional[float] = Field(default=None, gt=0)
+    adaptive_sampling: Optional[bool] = None
+    min_sample_rate: Optional[float] = Field(default=None, gt=0)
+    max_sample_rate: Optional[float] = Field(default=None, gt=0)
+    frame_budget: Optional[int] = Field(default=None, gt=0)  # most frames analyzed per video with adaptive sampling
+    inference_size: Optional[int] = Field(default=None, gt=0)  # YOLO input resolution, frames are decoded at this size
+    tiled_inference: Optional[bool] = None  # full-resolution tiles, for small objects in 4K footage
+    whisper_profile: Optional[str] = None  # fast, balanced or accurate, see src/whisper_profiles.py
+
+    @field_validator("whisper_profile")
+    @classmethod
+    def check_whisper_profile(cls, profile: Optional[str]) -> Optional[str]:
+        if profile is not None and profile not in WHISPER_PROFILES:
+            raise ValueError(f"Unknown Whisper profile: {profile}")
+        return profile
+
+    # A rate the client leaves out falls back to the pipeline default, so check against that too
+    @model_validator(mode="after")
+    def check_sample_rates(self):
+        min_rate = DEFAULT_MIN_SAMPLE_RATE if self.min_sample_rate is None else self.min_sample_rate
+        max_rate = DEFAULT_MAX_SAMPLE_RATE if self.max_sample_rate is None else self.max_sample_rate
+        if min_rate > max_rate:
+            raise ValueError(f"min_sample_rate {min_rate} is above max_sample_rate {max_rate}")
+        return self
 @app.post("/process/{job_id}")
-async def process_video(job_id: str, background_tasks: BackgroundTasks):
-    if job_id not in job_status:
+async def process_video(job_id: str, options: Optional[ProcessOptions] = None):
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(404, "Job ID not found")
-    job = job_status[job_id]
     if job["status"] != "pending":
         raise HTTPException(400, f"Job already {job['status']}")
-    background_tasks.add_task(process_video_task, job_id)
+    config = {"save_keyframes": SAVE_KEYFRAMES}
+    if options is not None:
+        # Only the options the client set override the pipeline defaults
+        config.update(options.model_dump(exclude_none=True))
+    queued = jobs.enqueue(job_id, config, MAX_QUEUE_DEPTH)
+    if queued == "full":
+        raise HTTPException(429, f"Queue is full ({MAX_QUEUE_DEPTH} jobs waiting), try again later")
+    if queued == "conflict":
+        # Another request queued the job between the status check above and this one
+        raise HTTPException(409, f"Job already {jobs.get(job_id)['status']}")
     return {
         "job_id": job_id,
-        "message": "Processing started. Use /status/{job_id} to check progress."
+        "queue_position": jobs.queue_position(job_id),
+        "message": "Processing queued. Use /status/{job_id} to check progress."
     }
+# Bad processing options get a 400, like every other bad request to /process, instead of
+# FastAPI's 422 (or a job that fails once a worker picks it up)
+@app.exception_handler(RequestValidationError)
+async def process_options_error(request: Request, exc: RequestValidationError):
+    if getattr(request.scope.get("route"), "endpoint", None) is not process_video:
+        return await request_validation_exception_handler(request, exc)
+    problems = "; ".join(
+        (f"{'.'.join(map(str, error['loc'][1:]))}: " if len(error["loc"]) > 1 else "") + error["msg"]
+        for error in exc.errors()
+    )
+    return JSONResponse(status_code=400, content={"detail": f"Invalid processing options: {problems}"})
 @app.get("/status/{job_id}")
 def get_status(job_id: str):
-    if job_id not in job_status:
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(404, "Job ID not found")
-    job = job_status[job_id]
     return {
         "job_id": job["job_id"],
         "status": job["status"],
         "progress": job["progress"],
         "message": job["message"],
+        "queue_position": jobs.queue_position(job_id),
         "error": job.get("error")
     }
-@app.get("/results/{job_id}")
-def get_results(job_id: str):
-    if job_id not in job_status:
+# Parsed results (without detections) and detection stores of recently viewed jobs. The
+# file's mtime is part of the key, so rewritten results are read again instead of served stale.
+@functools.lru_cache(maxsize=RESULTS_CACHE_SIZE)
+def cached_results(result_path: str, mtime: float):
+    return read_results(result_path)
+@functools.lru_cache(maxsize=RESULTS_CACHE_SIZE)
+def cached_detections(detections_path: str, mtime: float) -> DetectionStore:
+    return DetectionStore.load(detections_path)
+def completed_result_path(job_id: str) -> str:
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(404, "Job ID not found")
-    job = job_status[job_id]
     if job["status"] != "completed":
         raise HTTPException(400, f"Job is {job['status']}, not completed")
     result_path = job.get("result_path")
     if not result_path or not os.path.exists(result_path):
         raise HTTPException(404, "Results file not found")
-    with open(result_path, 'r') as f:
-        results = json.load(f)
-    return results
+    return result_path
+def sse_message(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+# Workers record events in the job store from their own processes, so the stream reads them
+# from there: one indexed query per poll on the server instead of a status request per client
+async def job_event_stream(job_id: str, request: Request, last_event_id: int):
+    last_status = None
+    last_sent = time.monotonic()
+    while not await request.is_disconnected():
+        # The job is read before its events, and batches are read until one comes back short: a
+        # job already finished here has had all its events sent before its end event
+        job = await run_in_threadpool(jobs.get, job_id)
+        position = await run_in_threadpool(jobs.queue_position, job_id) if job["status"] == "queued" else None
+        sent = 0
+        while True:
+            events = await run_in_threadpool(jobs.events_after, job_id, last_event_id, EVENTS_BATCH_SIZE)
+            for event in events:
+                last_event_id = event["id"]
+                yield sse_message("progress", event, last_event_id)
+            sent += len(events)
+            if len(events) < EVENTS_BATCH_SIZE:
+                break
+        status = {
+            "status": job["status"],
+            "progress": job["progress"],
+            "message": job["message"],
+            "queue_position": position,
+            "error": job.get("error")
+        }
+        if sent:
+            last_sent = time.monotonic()
+        # Progress already arrives as events, a status event is only sent when the state itself changes
+        state = (job["status"], position, job.get("error"))
+        if state != last_status:
+            yield sse_message("status", status)
+            last_status = state
+            last_sent = time.monotonic()
+        if job["status"] in ("completed", "failed"):
+            yield sse_message("end", status)
+            return
+        if time.monotonic() - last_sent > EVENTS_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+@app.get("/events/{job_id}")
+def stream_events(job_id: str, request: Request):
+    """Server-sent progress events of a job (per-stage counts, throughput and ETA) until it completes or fails."""
+    if jobs.get(job_id) is None:
+        raise HTTPException(404, "Job ID not found")
+    # A reconnecting EventSource resumes after the last event it received
+    last_event_id = request.headers.get("last-event-id", "0")
+    if not last_event_id.isdigit():
+        raise HTTPException(400, "Last-Event-ID must be an event id")
+    return StreamingResponse(
+        job_event_stream(job_id, request, int(last_event_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+@app.get("/results/{job_id}")
+def get_results(job_id: str, request: Request, fields: Optional[str] = None, offset: int = 0,
+                limit: Optional[int] = None, detections: bool = True):
+    """Analysis results, optionally only some fields and one page of frames and transcript segments."""
+    result_path = completed_result_path(job_id)
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    stat = os.stat(result_path)
+    # The same file version and query always give the same body
+    tag = hashlib.sha1(json.dumps(
+        [job_id, stat.st_mtime_ns, stat.st_size, selected, offset, limit, detections]
+    ).encode()).hexdigest()
+    etag = f'"{tag}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [value.strip().removeprefix("W/") for value in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+    data, detections_path = cached_results(result_path, stat.st_mtime)
+    store = None
+    if detections and detections_path and (selected is None or "frames" in selected):
+        store = cached_detections(detections_path, os.path.getmtime(detections_path))
+    try:
+        view = select_results(data, selected, offset, limit, store, detections)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return JSONResponse(view, headers={"ETag": etag})
+# Timeline indexes of recently scrubbed jobs, built over the cached results
+@functools.lru_cache(maxsize=RESULTS_CACHE_SIZE)
+def load_timeline(result_path: str, mtime: float) -> TimelineIndex:
+    return TimelineIndex(cached_results(result_path, mtime)[0])
+@app.get("/results/{job_id}/window")
+def get_results_window(job_id: str, start: float, end: float, kinds: Optional[str] = None):
+    """Tracks, scenes and speech segments of a job that overlap a time window, in seconds."""
+    if start < 0 or start > end:
+        raise HTTPException(400, "Window needs 0 <= start <= end")
+    result_path = completed_result_path(job_id)
+    selected = [kind.strip() for kind in kinds.split(",") if kind.strip()] if kinds else DEFAULT_WINDOW_KINDS
+    timeline = load_timeline(result_path, os.path.getmtime(result_path))
+    try:
+        window = timeline.window(start, end, selected)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return dict(window, job_id=job_id)
 @app.get("/download/{job_id}")
-def download_results(job_id: str):
-    if job_id not in job_status:
+async def download_results(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(404, "Job ID not found")
-    job = job_status[job_id]
     if job["status"] != "completed":
         raise HTTPException(400, f"Job is {job['status']}, not completed")
     result_path = job.get("result_path")
     if not result_path or not os.path.exists(result_path):
         raise HTTPException(404, "Results file not found")
-    return FileResponse(
-        result_path,
+    # Detections are stored in columnar form, the download gets the full nested JSON view
+    results = await run_in_threadpool(load_results, result_path)
+    return Response(
+        json.dumps(results, indent=2),
         media_type="application/json",
-        filename=f"analysis_{job_id}.json"
+        headers={"Content-Disposition": f'attachment; filename="analysis_{job_id}.json"'}
+    )
+@app.get("/download/{job_id}/detections")
+def download_detections(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job ID not found")
+    if job["status"] != "completed":
+        raise HTTPException(400, f"Job is {job['status']}, not completed")
+    detections_path = Path(job["result_path"]).parent / "detections.npz"
+    if not detections_path.exists():
+        raise HTTPException(404, "Detections file not found")
+    return FileResponse(
+        str(detections_path),
+        media_type="application/octet-stream",
+        filename=f"detections_{job_id}.npz"
     )
+# CLIP runs once per distinct query, repeated searches go straight to the index
+@functools.lru_cache(maxsize=1024)
+def embed_query(text: str):
+    with registry.scene_analyzer(SEARCH_CLIP_MODEL) as analyzer:
+        return analyzer.encode_texts([text])[0].cpu().numpy()
+@app.get("/search")
+def search_frames(q: str, k: int = 20, mode: str = "auto"):
+    """Frames of every analyzed video ranked by CLIP similarity to a free-text query."""
+    query = q.strip()
+    if not query:
+        raise HTTPException(400, "Query is empty")
+    if mode not in SEARCH_MODES:
+        raise HTTPException(400, f"Unknown search mode: {mode}")
+    if not 1 <= k <= 200:
+        raise HTTPException(400, "k must be between 1 and 200")
+    start = time.perf_counter()
+    hits = frame_index.search(embed_query(query), k, mode)
+    for hit in hits:
+        job = jobs.get(hit["job_id"])
+        hit["filename"] = job["filename"] if job else None
+    return {
+        "query": query,
+        "model": SEARCH_CLIP_MODEL,
+        "hits": hits,
+        "took_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+@app.get("/search/transcript")
+def search_transcripts(q: str, limit: int = 20, job_id: Optional[str] = None, phrase: bool = True):
+    """Transcript segments of every analyzed video containing a phrase, timed to the matching words.
+
+    Only the newest 2000 matching segments are ranked, so for common terms older videos can be
+    missing from the hits; truncated is true when that happened.
+    """
+    if not q.strip():
+        raise HTTPException(400, "Query is empty")
+    if not 1 <= limit <= 200:
+        raise HTTPException(400, "limit must be between 1 and 200")
+    start = time.perf_counter()
+    result = transcript_index.search(q, limit, job_id, phrase)
+    for hit in result["hits"]:
+        job = jobs.get(hit["job_id"])
+        hit["filename"] = job["filename"] if job else None
+    return {
+        "query": q.strip(),
+        "hits": result["hits"],
+        "truncated": result["truncated"],
+        "took_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
 
 if __name__ == "__main__":
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
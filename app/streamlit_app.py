@@ -29,6 +29,45 @@ with st.sidebar:
     st.markdown("**Created by:** Sejal Barshikar")
     st.markdown("**Tech Stack:** Python, PyTorch, FastAPI, Streamlit")
 
+# Progress pushed by the API as server-sent events, yielded as (event type, data) until the
+# job completes or fails. A dropped connection resumes after the last event received.
+def stream_job_events(job_id):
+    last_event_id = None
+    while True:
+        headers = {"Last-Event-ID": str(last_event_id)} if last_event_id is not None else {}
+        try:
+            with requests.get(f"{API_URL}/events/{job_id}", stream=True, headers=headers, timeout=(5, 60)) as response:
+                response.raise_for_status()
+                event_type, data = "message", []
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("id:"):
+                        last_event_id = int(line[3:].strip())
+                    elif line.startswith("event:"):
+                        event_type = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[5:].strip())
+                    elif not line and data:
+                        yield event_type, json.loads("\n".join(data))
+                        if event_type == "end":
+                            return
+                        event_type, data = "message", []
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError):
+            time.sleep(2)
+        except requests.exceptions.HTTPError:
+            yield "end", {"status": "failed", "error": "Progress stream unavailable"}
+            return
+
+
+def describe_stage_event(event):
+    line = f"{event['stage']}: {event['message']}"
+    if event.get("rate"):
+        line += f" · {event['rate']:.1f} {event['unit']}/s"
+    if int(event.get("eta") or 0):
+        minutes, seconds = divmod(int(event["eta"]), 60)
+        line += f" · about {minutes}m {seconds:02d}s left" if minutes else f" · about {seconds}s left"
+    return line
+
+
 tab1, tab2 = st.tabs(["Upload & Analyze", "View Results"])
 with tab1:
     st.header("Upload Video")
@@ -54,23 +93,26 @@ with tab1:
                             st.success(f"Processing started! Job ID: {job_id}")
                             progress_bar = st.progress(0)
                             status_text = st.empty()
-                            while True:
-                                status_response = requests.get(f"{API_URL}/status/{job_id}")
-                                status_data = status_response.json()
-                                progress = status_data["progress"]
-                                message = status_data["message"]
-                                status = status_data["status"]
-                                progress_bar.progress(progress)
-                                status_text.text(f"Status: {message} ({progress}%)")
-                                if status == "completed":
-                                    st.success("Analysis complete!")
-                                    st.balloons()
-                                    time.sleep(1)
-                                    break
-                                elif status == "failed":
-                                    st.error(f"Analysis failed: {status_data.get('error', 'Unknown error')}")
-                                    break
-                                time.sleep(2) 
+                            # One line per pipeline stage, they run side by side
+                            stage_lines = {}
+                            for event_type, event in stream_job_events(job_id):
+                                if event_type == "status" and event["status"] == "queued":
+                                    status_text.text(f"Status: queued, position {event['queue_position']}")
+                                elif event_type == "progress":
+                                    progress_bar.progress(event["progress"])
+                                    status_text.text(f"Status: {event['message']} ({event['progress']}%)")
+                                    if event["stage"]:
+                                        if event["stage"] not in stage_lines:
+                                            stage_lines[event["stage"]] = st.empty()
+                                        stage_lines[event["stage"]].caption(describe_stage_event(event))
+                                elif event_type == "end":
+                                    if event["status"] == "completed":
+                                        progress_bar.progress(100)
+                                        st.success("Analysis complete!")
+                                        st.balloons()
+                                        time.sleep(1)
+                                    else:
+                                        st.error(f"Analysis failed: {event.get('error') or 'Unknown error'}")
                         else:
                             st.error("Failed to start processing")
                     else:
@@ -80,9 +122,24 @@ with tab2:
     if "job_id" in st.session_state:
         job_id = st.session_state["job_id"]
         try:
-            results_response = requests.get(f"{API_URL}/results/{job_id}")
-            if results_response.status_code == 200:
+            # The dashboard never shows per-frame data, so frames and their detections stay on the
+            # server; the ETag lets a rerun reuse the copy already held in the session
+            cached = st.session_state.get("results_cache")
+            headers = {"If-None-Match": cached["etag"]} if cached and cached["job_id"] == job_id else {}
+            results_response = requests.get(
+                f"{API_URL}/results/{job_id}",
+                params={"fields": "video_metadata,summary,scenes,tracks,audio"},
+                headers=headers
+            )
+            results = None
+            if results_response.status_code == 304:
+                results = cached["results"]
+            elif results_response.status_code == 200:
                 results = results_response.json()
+                st.session_state["results_cache"] = {
+                    "job_id": job_id, "etag": results_response.headers.get("ETag"), "results": results
+                }
+            if results is not None:
                 # Summary Section
                 st.subheader("Summary")
                 col1, col2, col3, col4 = st.columns(4)
@@ -130,18 +187,32 @@ with tab2:
                         st.write("Timestamped Segments:")
                         for segment in results['audio']['segments']:
                             st.write(f"[{segment['start']:.2f}s - {segment['end']:.2f}s]: {segment['text']}")
+                    elif results['audio'].get('speech'):
+                        st.info("No speech detected in this video")
                     else:
                         st.info("No audio detected in this video")
+                    speech = results['audio'].get('speech')
+                    if speech:
+                        st.caption(f"Speech in {speech['speech_seconds']:.1f}s of {speech['audio_seconds']:.1f}s of audio ({speech['coverage']:.0%})")
                 with result_tab4:
                     st.subheader("Download Results")
-                    json_str = json.dumps(results, indent=2)
-                    st.download_button(
-                        label="Download Complete Analysis (JSON)",
-                        data=json_str,
-                        file_name=f"analysis_{job_id}.json",
-                        mime="application/json",
-                        use_container_width=True
-                    )
+                    # The complete analysis, detections included, is only fetched from the API when
+                    # asked for; the browser may not be able to reach API_URL itself
+                    if st.button("Prepare Complete Analysis (JSON)", use_container_width=True):
+                        download_response = requests.get(f"{API_URL}/download/{job_id}")
+                        if download_response.status_code == 200:
+                            st.session_state["full_download"] = {"job_id": job_id, "data": download_response.content}
+                        else:
+                            st.error("Failed to fetch the complete analysis")
+                    full_download = st.session_state.get("full_download")
+                    if full_download and full_download["job_id"] == job_id:
+                        st.download_button(
+                            label="Download Complete Analysis (JSON)",
+                            data=full_download["data"],
+                            file_name=f"analysis_{job_id}.json",
+                            mime="application/json",
+                            use_container_width=True
+                        )
                     if results['audio']['full_transcript']:
                         transcript_text = f"Language: {results['audio']['language']}\n\n"
                         transcript_text += "Full Transcript\n"
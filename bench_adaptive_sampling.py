@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from src.video_processor import get_video_info, iter_frames
+from src.adaptive_sampling import iter_frames_adaptive
+
+# Compares fixed-rate sampling with motion-adaptive sampling at the same frame
+# budget. The synthetic clip alternates static stretches with bursts where a box
+# moves fast; the gap the box jumps between two analyzed frames is what a tracker
+# has to bridge to keep its ID, so smaller jumps during action mean better tracking.
+# Usage: python bench_adaptive_sampling.py [sample_rate]
+sample_rate = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+# Removed with the clip when the script exits
+workdir = tempfile.TemporaryDirectory(prefix="bench_adaptive_")
+video_path = os.path.join(workdir.name, "bench_adaptive.mp4")
+width, height, fps = 960, 540, 30
+# (seconds, box speed in px/s)
+segments = [(12, 0), (4, 500), (12, 0), (4, 700), (12, 0), (4, 400)]
+box = 60
+
+positions = []
+x = 0.0
+for seconds, speed in segments:
+    for _ in range(seconds * fps):
+        positions.append((x, speed > 0))
+        x = (x + speed / fps) % (width - box)
+
+rng = np.random.default_rng(0)
+background = cv2.resize(rng.integers(0, 255, (27, 48, 3), dtype=np.uint8), (width, height), interpolation=cv2.INTER_CUBIC)
+writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+for x, _ in positions:
+    frame = background.copy()
+    cv2.rectangle(frame, (int(x), height // 2 - box // 2), (int(x) + box, height // 2 + box // 2), (0, 0, 255), -1)
+    writer.write(frame)
+writer.release()
+info = get_video_info(video_path)
+print(f"{info['duration']:.0f}s clip, {sum(s for s, v in segments if v)}s of motion")
+
+
+def report(name, sampled, elapsed):
+    jumps = []
+    for (prev_idx, _), (idx, _) in zip(sampled, sampled[1:]):
+        if positions[idx][1] or positions[prev_idx][1]:
+            # Distance the box travelled between the two analyzed frames, ignoring wrap-around
+            jumps.append(sum(abs(segments_speed(i)) / fps for i in range(prev_idx, idx)))
+    moving = sum(1 for idx, _ in sampled if positions[idx][1])
+    print(f"{name:>22}: {len(sampled):3d} frames ({moving:3d} during motion), "
+          f"box jump between frames: mean {np.mean(jumps):6.1f} px, max {np.max(jumps):6.1f} px, {elapsed:5.2f}s")
+
+
+def segments_speed(frame_idx):
+    elapsed = 0
+    for seconds, speed in segments:
+        elapsed += seconds * fps
+        if frame_idx < elapsed:
+            return speed
+    return 0
+
+
+start = time.perf_counter()
+fixed = [(idx, ts) for idx, ts, _ in iter_frames(video_path, sample_rate)]
+report(f"fixed {sample_rate} fps", fixed, time.perf_counter() - start)
+
+start = time.perf_counter()
+adaptive = [(idx, ts) for idx, ts, _ in iter_frames_adaptive(video_path, frame_budget=len(fixed))]
+report("adaptive, same budget", adaptive, time.perf_counter() - start)
+assert len(adaptive) <= len(fixed), "adaptive sampling went over its frame budget"
+
+start = time.perf_counter()
+half = [(idx, ts) for idx, ts, _ in iter_frames_adaptive(video_path, frame_budget=len(fixed) // 2)]
+report("adaptive, half budget", half, time.perf_counter() - start)
+assert len(half) <= len(fixed) // 2, "adaptive sampling went over its frame budget"
@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from src.frame_index import FrameIndex
+
+# Search latency of the frame index, exact against IVF, and how many of the exact top 10
+# IVF finds. The embeddings are synthetic: frames of a video cluster around a few scene
+# directions in the 512-d CLIP space, queries are noisy copies of random frames.
+# Usage: python bench_frame_index.py [num_frames]
+num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+frames_per_job = 3600
+dim = 512
+# Removed with everything in it when the script exits
+workdir = tempfile.TemporaryDirectory(prefix="bench_frame_index_")
+rng = np.random.default_rng(0)
+scenes = rng.normal(size=(2000, dim)).astype(np.float32)
+
+
+def normalize(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+index = FrameIndex(workdir.name, ivf_min_rows=50_000)
+start = time.perf_counter()
+for job, first in enumerate(range(0, num_frames, frames_per_job)):
+    count = min(frames_per_job, num_frames - first)
+    scene_ids = np.repeat(rng.integers(0, len(scenes), count // 60 + 1), 60)[:count]
+    embeddings = normalize(scenes[scene_ids] + 0.5 * rng.normal(size=(count, dim)).astype(np.float32))
+    index.add(f"job{job:04d}", embeddings.astype(np.float16), np.arange(count, dtype=np.float64))
+elapsed = time.perf_counter() - start
+size_mb = os.path.getsize(os.path.join(index.root, "embeddings.f16")) / 1024 / 1024
+print(f"\nIndexed {len(index)} frames in {elapsed:.1f}s ({size_mb:.0f} MB of float16 embeddings)")
+
+# Queries are near some frame, like a text query that matches what is on screen
+embeddings = np.memmap(os.path.join(index.root, "embeddings.f16"), dtype=np.float16, mode="r", shape=(len(index), dim))
+queries = normalize(embeddings[rng.integers(0, len(index), 50)].astype(np.float32) + 0.05 * rng.normal(size=(50, dim)).astype(np.float32))
+results = {}
+for mode, nprobe in (("exact", None), ("ivf", 8), ("ivf", 16), ("ivf", 32)):
+    index.search(queries[0], 10, mode, nprobe or 16)
+    start = time.perf_counter()
+    results[(mode, nprobe)] = [index.search(query, 10, mode, nprobe or 16) for query in queries]
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    recall = np.mean([
+        len({(h["job_id"], h["timestamp"]) for h in hits} & {(h["job_id"], h["timestamp"]) for h in exact}) / 10
+        for hits, exact in zip(results[(mode, nprobe)], results[("exact", None)])
+    ])
+    name = mode if nprobe is None else f"{mode} nprobe={nprobe}"
+    print(f"{name:>16}: {latency:7.1f} ms per query, recall@10 {recall:.2f}")
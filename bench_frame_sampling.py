@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from src.video_processor import get_video_info, iter_frames, choose_sampling_strategy
+
+# Usage: python bench_frame_sampling.py [video_path] [sample_rate]
+# Without a video path a synthetic 60 second 720p clip is generated, and removed on exit.
+workdir = tempfile.TemporaryDirectory(prefix="bench_sampling_")
+video_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(workdir.name, "bench_sampling.mp4")
+sample_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+if not os.path.exists(video_path):
+    print(f"Generating synthetic video at {video_path}")
+    width, height, fps = 1280, 720, 30
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(60 * fps):
+        frame = np.roll(background, i * 4, axis=1)
+        cv2.putText(frame, str(i), (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+        writer.write(frame)
+    writer.release()
+
+info = get_video_info(video_path)
+print(f"Video: {info['width']}x{info['height']} @ {info['fps']:.2f} fps, {info['frame_count']} frames, codec {info['codec']}")
+print(f"Sampling at {sample_rate} fps")
+print(f"Auto strategy: {choose_sampling_strategy(video_path, info, sample_rate)}")
+print()
+
+reference = None
+for strategy in ["read", "grab", "seek", "keyframes", "auto"]:
+    start = time.perf_counter()
+    try:
+        indices = [frame_idx for frame_idx, timestamp, frame in iter_frames(video_path, sample_rate, strategy)]
+    except Exception as e:
+        print(f"{strategy:>10}: failed ({e})")
+        continue
+    elapsed = time.perf_counter() - start
+    if reference is None:
+        reference = indices
+    match = "same frames" if indices == reference else f"{len(set(indices) & set(reference))}/{len(reference)} frames match read"
+    print(f"{strategy:>10}: {elapsed:6.2f}s  {len(indices)} frames  {info['duration'] / elapsed:6.1f}x realtime  ({match})")
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from src.data_integration import VideoAnalysisIntegrator, load_results, read_results, select_results
+from src.detection_store import DetectionStore
+
+# Body size and server time of the /results views the dashboard uses, against returning the
+# whole analysis with detections as every request used to. Results are synthetic: a 1 fps
+# sample of the video with 8 tracked detections per frame and a speech segment every 4s.
+# "cached" is what a request costs once the parsed results sit in the API's LRU cache.
+# Usage: python bench_results_api.py [minutes]
+minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+# Removed with everything in it when the script exits
+workdir = tempfile.TemporaryDirectory(prefix="bench_results_api_")
+root = workdir.name
+num_frames = int(minutes * 60)
+
+integrator = VideoAnalysisIntegrator()
+integrator.add_video_metadata({"fps": 30, "width": 1920, "height": 1080, "frame_count": num_frames * 30, "duration": num_frames})
+integrator.add_frame_detections(
+    list(range(0, num_frames * 30, 30)),
+    {frame * 30: [{"class": "person", "confidence": 0.87, "bbox": [10.0 * i, 20.0, 10.0 * i + 50, 120.0], "track_id": frame // 60 * 8 + i}
+                  for i in range(8)] for frame in range(num_frames)},
+    timestamps=[float(frame) for frame in range(num_frames)]
+)
+integrator.compute_tracks_summary()
+integrator.add_audio_transcript({"text": "words " * 1000, "segments": [
+    {"start": float(t), "end": t + 3.5, "text": "a few words of speech"} for t in range(0, num_frames, 4)
+]})
+integrator.generate_summary()
+result_path = os.path.join(root, "analysis_results.json")
+integrator.export(result_path, os.path.join(root, "detections.npz"))
+
+views = {
+    "everything (old default)": dict(fields=None),
+    "dashboard": dict(fields=["video_metadata", "summary", "scenes", "tracks", "audio"]),
+    "summary only": dict(fields=["summary"]),
+    "100 frames page": dict(fields=["frames"], offset=0, limit=100),
+}
+data, detections_path = read_results(result_path)
+store = DetectionStore.load(detections_path)
+for name, view in views.items():
+    began = time.perf_counter()
+    if view["fields"] is None:
+        body = json.dumps(load_results(result_path))
+    else:
+        body = json.dumps(select_results(read_results(result_path)[0], store=DetectionStore.load(detections_path), **view))
+    cold_ms = (time.perf_counter() - began) * 1000
+    began = time.perf_counter()
+    json.dumps(select_results(data, store=store, **view))
+    cached_ms = (time.perf_counter() - began) * 1000
+    print(f"{name:>25}: {len(body) / 1024:9.1f} KB, {cold_ms:8.1f} ms parsing the file, {cached_ms:7.1f} ms cached")
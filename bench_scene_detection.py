@@ -0,0 +1,60 @@
+import time
+import cv2
+import numpy as np
+from src.scene_detection import SceneChangeDetector, SCENE_DETECTION_MODES
+
+# Synthetic 1080p sequence: 20 shots with camera motion, noise and a slow fade,
+# separated by hard cuts at known frame indices.
+rng = np.random.default_rng(0)
+width, height = 1920, 1080
+frames = []
+true_cuts = []
+for shot in range(20):
+    if shot > 0:
+        true_cuts.append(len(frames))
+    base = cv2.resize(rng.integers(0, 255, (27, 48, 3), dtype=np.uint8), (width, height), interpolation=cv2.INTER_CUBIC)
+    # Each shot gets its own colour cast, like real footage
+    base = (base * rng.uniform(0.3, 1.0, 3)).astype(np.uint8)
+    for i in range(int(rng.integers(8, 25))):
+        frame = np.roll(base, i * 6, axis=1)
+        frame = cv2.convertScaleAbs(frame, alpha=1.0 - 0.01 * i)
+        frame = cv2.add(frame, rng.integers(0, 12, frame.shape, dtype=np.uint8))
+        frames.append(frame)
+print(f"{len(frames)} frames at {width}x{height}, {len(true_cuts)} cuts")
+
+
+def score(found, expected, tolerance=1):
+    found = [b for b in found if b != 0]
+    hits = sum(1 for b in found if any(abs(b - c) <= tolerance for c in expected))
+    precision = hits / len(found) if found else 1.0
+    recall = hits / len(expected) if expected else 1.0
+    return precision, recall
+
+
+# The original approach: full resolution grayscale difference per pair
+start = time.perf_counter()
+legacy = [0]
+prev = None
+for i, frame in enumerate(frames):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if prev is not None and np.mean(cv2.absdiff(prev, gray)) > 30.0:
+        legacy.append(i)
+    prev = gray
+elapsed = time.perf_counter() - start
+precision, recall = score(legacy, true_cuts)
+print(f"{'full-res diff':>18}: precision {precision:.2f}  recall {recall:.2f}  {len(frames) / elapsed:8.1f} fps")
+
+for mode in SCENE_DETECTION_MODES:
+    detector = SceneChangeDetector(mode=mode)
+    start = time.perf_counter()
+    for frame in frames:
+        detector.update(frame)
+    elapsed = time.perf_counter() - start
+    precision, recall = score(detector.boundaries, true_cuts)
+    print(f"{mode + ' (stream)':>18}: precision {precision:.2f}  recall {recall:.2f}  {len(frames) / elapsed:8.1f} fps")
+
+    start = time.perf_counter()
+    boundaries = detector.detect(frames)
+    elapsed = time.perf_counter() - start
+    precision, recall = score(boundaries, true_cuts)
+    print(f"{mode + ' (batch)':>18}: precision {precision:.2f}  recall {recall:.2f}  {len(frames) / elapsed:8.1f} fps")
@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from src.video_processor import get_video_info, iter_frames, SAMPLING_STRATEGIES
+from src.data_integration import VideoAnalysisIntegrator
+
+# Regression check for sampled-frame timing: every frame of a synthetic clip has
+# its source index drawn into it as a row of black/white blocks, so each sampled
+# frame can be matched to the frame it really is. Timestamps reported by the
+# sampler and stored by the integrator must agree with that frame's real time.
+# Usage: python bench_timestamps.py [sample_rate]
+sample_rate = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+# Removed with both clips when the script exits
+workdir = tempfile.TemporaryDirectory(prefix="bench_timestamps_")
+output_dir = workdir.name
+width, height, fps, num_frames = 640, 360, 30, 600
+bits, block = 12, 40
+
+
+def draw_index(frame_idx: int) -> np.ndarray:
+    frame = np.full((height, width, 3), 60, dtype=np.uint8)
+    for bit in range(bits):
+        value = 255 if (frame_idx >> bit) & 1 else 0
+        frame[:block, bit * block:(bit + 1) * block] = value
+    return frame
+
+
+def read_index(frame: np.ndarray) -> int:
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return sum(1 << bit for bit in range(bits) if gray[5:block - 5, bit * block + 5:(bit + 1) * block - 5].mean() > 128)
+
+
+cfr_path = os.path.join(output_dir, "cfr.mp4")
+writer = cv2.VideoWriter(cfr_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+for i in range(num_frames):
+    writer.write(draw_index(i))
+writer.release()
+# Real presentation time of source frame n
+videos = {"constant frame rate": (cfr_path, lambda n: n / fps)}
+
+# Variable frame rate copy with a 10 second gap halfway through, where frame_idx / fps is wrong
+if shutil.which("ffmpeg"):
+    vfr_path = os.path.join(output_dir, "vfr.mp4")
+    gap = num_frames // 2
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error', '-i', cfr_path,
+        '-vf', f"setpts='(N+gte(N\\,{gap})*{10 * fps})/{fps}/TB'",
+        '-vsync', 'vfr', '-c:v', 'mpeg4', '-q:v', '2', vfr_path
+    ], check=True)
+    videos["variable frame rate"] = (vfr_path, lambda n: (n + (10 * fps if n >= gap else 0)) / fps)
+else:
+    print("ffmpeg not found, skipping the variable frame rate clip")
+
+failures = 0
+for name, (video_path, true_time) in videos.items():
+    info = get_video_info(video_path)
+    print(f"\n{name}: {info['frame_count']} frames @ {info['fps']:.2f} fps, sampling at {sample_rate} fps")
+    for strategy in SAMPLING_STRATEGIES:
+        start = time.perf_counter()
+        sampled = [(frame_idx, timestamp, read_index(frame)) for frame_idx, timestamp, frame in iter_frames(video_path, sample_rate, strategy)]
+        elapsed = time.perf_counter() - start
+        frame_indices = [frame_idx for frame_idx, _, _ in sampled]
+        timestamps = [timestamp for _, timestamp, _ in sampled]
+
+        integrator = VideoAnalysisIntegrator()
+        integrator.add_video_metadata(info)
+        integrator.add_frame_detections(frame_indices, {}, frame_indices, timestamps)
+        integrator.add_scenes([{
+            'scene_number': 1, 'start_frame': 0, 'end_frame': len(sampled) - 1,
+            'description': '', 'confidence': 0.0, 'key_frame_path': None
+        }])
+
+        index_errors = sum(1 for frame_idx, _, actual in sampled if frame_idx != actual)
+        time_error = max(abs(frame["timestamp"] - true_time(actual)) for frame, (_, _, actual) in zip(integrator.data["frames"], sampled))
+        # What the integrator used to store: position in the sampled list / fps
+        legacy_error = max(abs(position / info["fps"] - true_time(actual)) for position, (_, _, actual) in enumerate(sampled))
+        last_time = true_time(sampled[-1][2])
+        scene_ok = integrator.data["scenes"][0]["end_time"] >= last_time
+        # seek and keyframes derive the index from the timestamp and the average fps, which only
+        # matches the decoded frame count at a constant frame rate (read_frames_at seeks the same way)
+        check_indices = name == "constant frame rate" or strategy in ("read", "grab")
+        ok = (index_errors == 0 or not check_indices) and time_error <= 0.5 / fps and scene_ok
+        failures += not ok
+        print(f"{strategy:>10}: {len(sampled):3d} frames, {index_errors} wrong indices, max time error {time_error * 1000:6.1f} ms "
+              f"(old {legacy_error:6.2f} s), scene ends {integrator.data['scenes'][0]['end_time']:6.2f}s, "
+              f"{elapsed * 1000:7.1f} ms  {'OK' if ok else 'FAIL'}")
+
+print(f"\n{'All timestamps aligned' if failures == 0 else f'{failures} misaligned run(s)'}")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from src.transcript_index import TranscriptIndex
+
+# Transcript search latency as the library grows: the FTS5 index against the only
+# option before it, loading every job's analysis_results.json and scanning its
+# segments. Transcripts are synthetic, 100 segments of 12 words per job drawn from a
+# Zipf-distributed vocabulary so common words hit many jobs and rare ones few.
+# Usage: python bench_transcript_index.py [max_jobs]
+max_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+checkpoints = [n for n in (50, 500, 5000, 50000) if n <= max_jobs]
+# Removed with everything in it when the script exits
+workdir = tempfile.TemporaryDirectory(prefix="bench_transcript_index_")
+root = workdir.name
+rng = np.random.default_rng(0)
+vocabulary = np.array([f"w{i}" for i in range(20000)])
+queries = {"common word": "w1", "rare word": "w15000", "phrase": None}
+
+
+def make_audio(job):
+    segments = []
+    for i in range(100):
+        words = vocabulary[np.minimum(rng.zipf(1.3, 12), len(vocabulary)) - 1]
+        segments.append({
+            "start": i * 5.0, "end": i * 5.0 + 4.8, "text": " ".join(words),
+            "words": [{"word": word, "start": i * 5.0 + j * 0.4, "end": i * 5.0 + j * 0.4 + 0.3} for j, word in enumerate(words)]
+        })
+    return {"language": "en", "full_transcript": "", "segments": segments}
+
+
+def scan_json(paths, phrase):
+    hits = []
+    for path in paths:
+        with open(path) as f:
+            audio = json.load(f)["audio"]
+        hits.extend((path, segment["start"]) for segment in audio["segments"] if phrase in segment["text"])
+    return hits
+
+
+index = TranscriptIndex(os.path.join(root, "transcripts.db"))
+paths = []
+jobs = 0
+for checkpoint in checkpoints:
+    start = time.perf_counter()
+    while jobs < checkpoint:
+        audio = make_audio(jobs)
+        index.add(f"job{jobs:05d}", audio)
+        # Keep JSON copies only while scanning them stays affordable
+        if checkpoint <= 500:
+            path = os.path.join(root, f"job{jobs:05d}.json")
+            with open(path, "w") as f:
+                json.dump({"audio": audio}, f)
+            paths.append(path)
+        if jobs == 0:
+            # A phrase from the first job
+            queries["phrase"] = " ".join(audio["segments"][50]["text"].split()[3:6])
+        jobs += 1
+    print(f"\n{jobs} jobs ({jobs * 100} segments), indexed in {time.perf_counter() - start:.1f}s")
+    for name, query in queries.items():
+        index.search(query, 20)
+        start = time.perf_counter()
+        for _ in range(20):
+            result = index.search(query, 20)
+        latency = (time.perf_counter() - start) / 20 * 1000
+        truncated = ", older matches cut" if result["truncated"] else ""
+        line = f"{name:>12}: FTS5 {latency:7.2f} ms ({len(result['hits'])} hits{truncated})"
+        if len(paths) == jobs:
+            start = time.perf_counter()
+            scan_json(paths, query)
+            line += f", JSON scan {(time.perf_counter() - start) * 1000:8.1f} ms"
+        print(line)
@@ -0,0 +1,64 @@
+import os
+import re
+import sys
+import time
+import numpy as np
+from src.audio_processing import AudioTranscriber, SAMPLE_RATE, load_audio
+from src.whisper_profiles import DECODE_OPTIONS, WHISPER_PROFILES
+
+# Realtime factor and word error rate of each Whisper profile on one recording with a
+# known transcript, to pick the speed/accuracy tradeoff per customer tier. The sample
+# is any audio or video file next to a .txt file of the same name holding what is said.
+# Usage: python bench_whisper_profiles.py [audio_or_video] [reference.txt] [profile,profile,...]
+audio_path = sys.argv[1] if len(sys.argv) > 1 else "data/sample/speech.wav"
+reference_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(audio_path)[0] + ".txt"
+profiles = sys.argv[3].split(",") if len(sys.argv) > 3 else list(WHISPER_PROFILES)
+if not os.path.exists(audio_path) or not os.path.exists(reference_path):
+    print(f"Need a speech sample and its transcript: {audio_path}, {reference_path}")
+    sys.exit(1)
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+# Word-level edit distance over the number of reference words, one row of the table at a time
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize(reference), np.array(normalize(hypothesis))
+    offsets = np.arange(len(hyp) + 1)
+    row = offsets.copy()
+    for i, word in enumerate(ref, 1):
+        # Deletion or substitution, then insertions as a running minimum along the row
+        best = np.empty_like(row)
+        best[0] = i
+        best[1:] = np.minimum(row[1:] + 1, row[:-1] + (hyp != word))
+        row = np.minimum.accumulate(best - offsets) + offsets
+    return row[-1] / max(len(ref), 1)
+
+
+samples = load_audio(audio_path)
+duration = len(samples) / SAMPLE_RATE
+with open(reference_path) as f:
+    reference = f.read()
+print(f"{duration:.1f}s of audio, {len(normalize(reference))} reference words")
+
+results = []
+for name in profiles:
+    profile = WHISPER_PROFILES[name]
+    start = time.perf_counter()
+    transcriber = AudioTranscriber(profile["model"], profile["quantize"])
+    load = time.perf_counter() - start
+    options = {key: profile[key] for key in DECODE_OPTIONS}
+    # One-off setup (kernels, caches) shouldn't be billed to the first profile
+    transcriber.transcribe(samples[:5 * SAMPLE_RATE], **options)
+    start = time.perf_counter()
+    result = transcriber.transcribe(samples, **options)
+    elapsed = time.perf_counter() - start
+    results.append((name, profile["model"] + (" int8" if transcriber.quantized else ""), elapsed, word_error_rate(reference, result["text"]), load))
+    del transcriber
+
+print()
+for name, model, elapsed, wer, load in results:
+    # Realtime factor: processing time over audio time, below 1 is faster than realtime
+    print(f"{name:>9} ({model:>10}): RTF {elapsed / duration:.3f} ({duration / elapsed:5.1f}x realtime), "
+          f"WER {wer:6.1%}, model load {load:.1f}s")
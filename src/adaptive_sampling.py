@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+from typing import Iterator, Optional, Tuple
+from src.scene_detection import make_thumbnail
+from src.video_processor import get_video_info, iter_frames
+
+# Sampling rates, in frames per second, that adaptive sampling moves between by default
+DEFAULT_MIN_SAMPLE_RATE = 0.25
+DEFAULT_MAX_SAMPLE_RATE = 4.0
+
+
+# Decides frame by frame whether a candidate frame is worth running the models on.
+# The sampling rate moves between min_rate and max_rate with the motion between
+# candidates, measured as the percentage of thumbnail pixels that changed (a mean
+# difference would drown a small moving object in the static background), and a
+# token bucket keeps the total under frame_budget: static stretches save tokens
+# that action can spend.
+class AdaptiveSampler:
+    def __init__(self, min_rate: float = DEFAULT_MIN_SAMPLE_RATE, max_rate: float = DEFAULT_MAX_SAMPLE_RATE,
+                 motion_threshold: float = 1.0, frame_budget: Optional[int] = None, duration: Optional[float] = None,
+                 thumbnail_width: int = 128, pixel_threshold: float = 20.0, burst_seconds: float = 8.0,
+                 pace_seconds: float = 4.0):
+        if min_rate <= 0 or max_rate < min_rate:
+            raise ValueError(f"Invalid sampling rates: min {min_rate}, max {max_rate}")
+        if frame_budget is not None and (frame_budget < 1 or not duration):
+            raise ValueError("A frame budget needs a positive budget and the video duration")
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.motion_threshold = motion_threshold
+        self.frame_budget = frame_budget
+        self.duration = duration
+        self.thumbnail_width = thumbnail_width
+        self.pixel_threshold = pixel_threshold
+        self.burst_seconds = burst_seconds
+        self.pace_seconds = pace_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        self.prev_features = None
+        self.last_sampled_time = None
+        self.last_time = 0.0
+        self.motion = 0.0
+        self.candidates = 0
+        self.sampled = 0
+        if self.frame_budget is not None:
+            # A couple of seconds' worth of tokens up front, the rest trickles in evenly over the
+            # video, so the frames sampled never add up to more than the budget. Up to
+            # burst_seconds at max_rate can be saved up during static stretches.
+            self.tokens = min(float(self.frame_budget), max(self.max_rate * 2.0, 1.0))
+            self.capacity = max(self.tokens, self.max_rate * self.burst_seconds)
+            self.refill_rate = (self.frame_budget - self.tokens) / self.duration
+
+    def rate_for(self, motion: float) -> float:
+        activity = min(motion / self.motion_threshold, 1.0)
+        return self.min_rate + (self.max_rate - self.min_rate) * activity
+
+    # Returns True when this frame should be sampled
+    def update(self, timestamp: float, frame: np.ndarray) -> bool:
+        thumbnail = make_thumbnail(frame, self.thumbnail_width)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        features = thumbnail.astype(np.float32)
+        if self.prev_features is not None:
+            changed = np.abs(features - self.prev_features) > self.pixel_threshold
+            self.motion = 100.0 * float(changed.mean())
+        self.prev_features = features
+        self.candidates += 1
+
+        if self.frame_budget is not None:
+            self.tokens = min(self.capacity, self.tokens + (timestamp - self.last_time) * self.refill_rate)
+        self.last_time = timestamp
+
+        if self.last_sampled_time is not None:
+            rate = self.rate_for(self.motion)
+            if self.frame_budget is not None:
+                # Spread the saved-up tokens over the next few seconds rather than spending them
+                # all at max_rate and then starving for the rest of the action
+                rate = max(min(rate, self.refill_rate + self.tokens / self.pace_seconds), 1e-6)
+            # Candidates arrive every 1 / max_rate seconds, so allow half of that as slack
+            interval = 1.0 / rate - 0.5 / self.max_rate
+            if timestamp - self.last_sampled_time < interval:
+                return False
+        if self.frame_budget is not None:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+        self.last_sampled_time = timestamp
+        self.sampled += 1
+        return True
+
+
+# Decodes candidates at max_rate and yields only the (index, timestamp, frame) tuples the sampler keeps
+def iter_frames_adaptive(video_path: str, min_rate: float = DEFAULT_MIN_SAMPLE_RATE,
+                         max_rate: float = DEFAULT_MAX_SAMPLE_RATE, frame_budget: Optional[int] = None,
+                         motion_threshold: float = 1.0, strategy: str = "auto",
+                         max_size: Optional[int] = None) -> Iterator[Tuple[int, float, np.ndarray]]:
+    info = get_video_info(video_path)
+    sampler = AdaptiveSampler(min_rate, max_rate, motion_threshold, frame_budget, info["duration"])
+    for frame_idx, timestamp, frame in iter_frames(video_path, max_rate, strategy, max_size):
+        if sampler.update(timestamp, frame):
+            yield frame_idx, timestamp, frame
+    print(f"Adaptive sampling kept {sampler.sampled} of {sampler.candidates} candidate frames")
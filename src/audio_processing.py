@@ -1,9 +1,13 @@
 import whisper
 import os
+import torch
+import numpy as np
 from pathlib import Path
-from typing import Dict, List, Optional 
+from typing import Dict, List, Optional, Tuple, Union
 import subprocess
 
+SAMPLE_RATE = 16000
+
 def extract_audio(video_path: str, output_audio_path: str) -> str:
     print(f"Extracting audio from {video_path}")
     command = [
@@ -22,21 +26,271 @@ def extract_audio(video_path: str, output_audio_path: str) -> str:
     print(f"Audio extracted to {output_audio_path}")
     return output_audio_path
 
+def video_has_audio(video_path: str) -> bool:
+    try:
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=codec_type',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return result.stdout.strip() == 'audio'
+    except:
+        return False
+
+# Decodes the audio track straight from ffmpeg's stdout into float32 samples in [-1, 1],
+# without a temporary WAV. expected_seconds sizes the buffer up front; with memmap_path
+# the buffer is a memory-mapped file instead of RAM, for recordings that run for hours.
+def load_audio(video_path: str, sample_rate: int = SAMPLE_RATE, expected_seconds: Optional[float] = None,
+               memmap_path: Optional[str] = None, read_size: int = 1 << 20) -> np.ndarray:
+    command = [
+        'ffmpeg',
+        '-nostdin',
+        '-loglevel', 'error',
+        '-i', video_path,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate),
+        '-ac', '1',
+        '-'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    capacity = int((expected_seconds or 60.0) * sample_rate * 1.02) + sample_rate
+
+    def allocate(size: int, old: Optional[np.ndarray] = None, filled: int = 0) -> np.ndarray:
+        if memmap_path is None:
+            buffer = np.empty(size, dtype=np.float32)
+            if old is not None:
+                buffer[:filled] = old[:filled]
+            return buffer
+        if old is not None:
+            old.flush()
+        # Growing the file keeps what was already written
+        with open(memmap_path, 'r+b' if old is not None else 'w+b') as f:
+            f.truncate(size * 4)
+        return np.memmap(memmap_path, dtype=np.float32, mode='r+', shape=(size,))
+
+    buffer = allocate(capacity)
+    filled = 0
+    leftover = b''
+    try:
+        while True:
+            data = process.stdout.read(read_size)
+            if not data:
+                break
+            if leftover:
+                data = leftover + data
+            # A read can end halfway through a sample
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16)
+            if filled + len(samples) > capacity:
+                capacity = max(capacity * 2, filled + len(samples))
+                buffer = allocate(capacity, buffer, filled)
+            np.multiply(samples, 1.0 / 32768.0, out=buffer[filled:filled + len(samples)], casting='unsafe')
+            filled += len(samples)
+        stderr = process.stderr.read().decode(errors='replace')
+        if process.wait() != 0:
+            raise RuntimeError(f"FFmpeg failed: {stderr}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    print(f"Decoded {filled / sample_rate:.1f}s of audio{' into ' + memmap_path if memmap_path else ''}")
+    return buffer[:filled]
+
+# Root mean square energy of consecutive non-overlapping frames
+def rms_energy(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    num_frames = len(samples) // frame_length
+    frames = samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+# Per-frame loudness in dBFS and share of the energy in the 300-3400 Hz speech band,
+# computed a block at a time so memory-mapped hours of audio are never copied whole
+def speech_features(samples: np.ndarray, frame_length: int, sample_rate: int = SAMPLE_RATE,
+                    block_frames: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    num_frames = len(samples) // frame_length
+    n_fft = 1 << (frame_length - 1).bit_length()
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    band = (freqs >= 300) & (freqs <= 3400)
+    window = np.hanning(frame_length).astype(np.float32)
+    energy_db = np.empty(num_frames, dtype=np.float32)
+    band_ratio = np.empty(num_frames, dtype=np.float32)
+    for first in range(0, num_frames, block_frames):
+        last = min(first + block_frames, num_frames)
+        frames = np.asarray(samples[first * frame_length:last * frame_length], dtype=np.float32).reshape(-1, frame_length)
+        energy_db[first:last] = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * window, n=n_fft, axis=1)) ** 2
+        band_ratio[first:last] = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-10)
+    return energy_db, band_ratio
+
+# Lightweight voice activity detection, returns (start, end) sample ranges holding speech.
+# A frame counts as speech when it is threshold_db above the recording's noise floor, most
+# of its energy sits in the speech band, and the loudness around it swings by modulation_db
+# within a second, the way it does between syllables. Sustained music and steady background
+# noise fail the last test, silence fails the first. Gaps shorter than min_gap_seconds are
+# bridged, regions with under min_speech_seconds of speech dropped and the rest padded.
+def detect_speech_regions(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_seconds: float = 0.03,
+                          threshold_db: float = 12.0, min_level_db: float = -50.0, band_threshold: float = 0.5,
+                          modulation_db: float = 10.0, min_gap_seconds: float = 0.5,
+                          min_speech_seconds: float = 0.3, pad_seconds: float = 0.2) -> List[Tuple[int, int]]:
+    frame_length = int(frame_seconds * sample_rate)
+    energy_db, band_ratio = speech_features(samples, frame_length, sample_rate)
+    if len(energy_db) == 0:
+        return []
+    noise_floor = max(float(np.percentile(energy_db, 10)), -90.0)
+    loud = energy_db > max(noise_floor + threshold_db, min_level_db)
+    half_window = int(0.5 / frame_seconds)
+    padded = np.pad(energy_db, half_window, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half_window + 1)
+    modulated = windows.max(axis=1) - windows.min(axis=1) > modulation_db
+    speech = loud & (band_ratio > band_threshold) & modulated
+    if not speech.any():
+        return []
+
+    # Runs of speech frames as [start, end) frame ranges, then bridge the short gaps
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    max_gap = int(min_gap_seconds / frame_seconds)
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] > max_gap))
+    group = np.cumsum(keep) - 1
+    speech_frames = np.bincount(group, weights=ends - starts)
+    region_starts = starts[keep]
+    region_ends = ends[np.concatenate((keep[1:], [True]))]
+    long_enough = speech_frames * frame_seconds >= min_speech_seconds
+
+    pad = int(pad_seconds * sample_rate)
+    regions = []
+    for start, end in zip(region_starts[long_enough], region_ends[long_enough]):
+        start = max(int(start) * frame_length - pad, 0)
+        end = min(int(end) * frame_length + pad, len(samples))
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+# Joins speech regions into spans worth one Whisper call: neighbours closer than max_gap
+# samples share a span as long as it stays within max_length, longer silences are skipped
+def group_speech_regions(regions: List[Tuple[int, int]], max_length: int, max_gap: int) -> List[Tuple[int, int]]:
+    groups = []
+    for start, end in regions:
+        if groups and start - groups[-1][1] <= max_gap and end - groups[-1][0] <= max_length:
+            groups[-1] = (groups[-1][0], end)
+        else:
+            groups.append((start, end))
+    return groups
+
+# How much of the recording holds speech, stored with the transcript
+def speech_summary(regions: List[Tuple[int, int]], num_samples: int, sample_rate: int = SAMPLE_RATE) -> Dict:
+    speech_samples = sum(end - start for start, end in regions)
+    return {
+        'audio_seconds': round(num_samples / sample_rate, 2),
+        'speech_seconds': round(speech_samples / sample_rate, 2),
+        'coverage': round(speech_samples / num_samples, 4) if num_samples else 0.0,
+        'regions': [
+            {'start': round(start / sample_rate, 2), 'end': round(end / sample_rate, 2)} for start, end in regions
+        ]
+    }
+
+# Splits audio into (start, end) sample ranges of about chunk_seconds, each cut placed
+# at the quietest 100 ms in the last search_seconds before the target length, so
+# chunks rarely split a word
+def find_chunk_boundaries(samples: np.ndarray, chunk_seconds: float = 120.0, search_seconds: float = 10.0,
+                          sample_rate: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    if chunk_seconds < 1:
+        raise ValueError(f"chunk_seconds must be at least 1, got {chunk_seconds}")
+    chunk_length = int(chunk_seconds * sample_rate)
+    # A short tail isn't worth its own chunk
+    if len(samples) <= chunk_length * 1.5:
+        return [(0, len(samples))]
+    frame_length = sample_rate // 10
+    energy = rms_energy(samples, frame_length)
+    # Cuts are searched for in at most the back half of a chunk, so no chunk comes out a sliver
+    search_frames = max(min(int(search_seconds * sample_rate), chunk_length // 2) // frame_length, 1)
+    boundaries = []
+    start = 0
+    while len(samples) - start > chunk_length * 1.5:
+        target = (start + chunk_length) // frame_length
+        # Never reaches back to the chunk's start, so every cut lands past the previous one
+        window_start = max(start // frame_length + 1, target - search_frames)
+        window = energy[window_start:target]
+        cut = (window_start + int(np.argmin(window))) * frame_length
+        boundaries.append((start, cut))
+        start = cut
+    boundaries.append((start, len(samples)))
+    return boundaries
+
+# Stitches transcripts of consecutive chunks into one, shifting times by each chunk's offset in seconds
+def merge_transcripts(parts: List[Tuple[float, Dict]], language: Optional[str] = None) -> Dict:
+    segments = []
+    texts = []
+    for offset, part in sorted(parts, key=lambda item: item[0]):
+        texts.append(part['text'].strip())
+        for segment in part['segments']:
+            segment = dict(segment, id=len(segments), start=segment['start'] + offset, end=segment['end'] + offset)
+            if 'words' in segment:
+                segment['words'] = [
+                    dict(word, start=word['start'] + offset, end=word['end'] + offset) for word in segment['words']
+                ]
+            segments.append(segment)
+    if language is None:
+        language = parts[0][1]['language'] if parts else 'unknown'
+    return {'text': ' '.join(text for text in texts if text), 'segments': segments, 'language': language}
+
+# int8 dynamic quantization of every Linear layer for CPU inference. Whisper's own Linear
+# subclass only casts the weights to the input dtype, a no-op in float32, and
+# quantize_dynamic matches module types exactly, so they are turned back into
+# torch.nn.Linear first.
+def quantize_linear_layers(model: torch.nn.Module) -> torch.nn.Module:
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
 class AudioTranscriber:
-    def __init__(self, model_name:str = 'base'):
+    # quantize swaps the Linear layers for int8 dynamically quantized ones when the model runs on CPU
+    def __init__(self, model_name:str = 'base', quantize: bool = False):
         print(f"loading Whisper model: {model_name}")
         self.model = whisper.load_model(model_name)
-    def transcribe(self, audio_path: str, language: Optional[str]= None) -> Dict:
-        print(f"Transcribing {audio_path}")
+        self.quantized = quantize and self.model.device.type == 'cpu'
+        if self.quantized:
+            self.model = quantize_linear_layers(self.model)
+            print("Quantized Whisper Linear layers to int8")
+    # audio is a file path or 16 kHz float32 samples; the decoding options default to the "balanced" profile
+    def transcribe(self, audio_path: Union[str, np.ndarray], language: Optional[str]= None,
+                   beam_size: Optional[int] = None, best_of: Optional[int] = None,
+                   temperature: Union[float, Tuple[float, ...]] = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+                   word_timestamps: bool = True) -> Dict:
+        if isinstance(audio_path, str):
+            print(f"Transcribing {audio_path}")
+        else:
+            print(f"Transcribing {len(audio_path) / SAMPLE_RATE:.1f}s of audio")
         result = self.model.transcribe(
             audio_path,
             language = language,
-            word_timestamps= True, 
+            temperature = temperature,
+            word_timestamps= word_timestamps,
+            beam_size = beam_size,
+            best_of = best_of,
+            # Half precision only exists on GPU
+            fp16 = self.model.device.type != 'cpu',
             verbose= False
         )
         print("Transcription complete!")
         print(f"Detected language: {result['language']}")
         return result
+
+    # Language of the first 30 seconds, so every chunk of a long recording is decoded the same way
+    def detect_language(self, samples: np.ndarray) -> str:
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), self.model.dims.n_mels).to(self.model.device)
+        _, probs = self.model.detect_language(mel)
+        return max(probs, key=probs.get)
     
     def format_transcript(self, result: Dict) -> str: 
         formatted = []
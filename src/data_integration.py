@@ -1,7 +1,14 @@
 import json
+import os
+import numpy as np
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from datetime import datetime
+from src.detection_store import DetectionStore
+from src.timeline_index import DEFAULT_WINDOW_KINDS, TimelineIndex
+
+# Top-level sections of the results; frames and audio segments can be paged
+RESULT_FIELDS = ("video_metadata", "audio", "scenes", "frames", "tracks", "summary")
 
 
 class VideoAnalysisIntegrator:
@@ -14,6 +21,13 @@ class VideoAnalysisIntegrator:
             "tracks": {},
             "summary": {}
         }
+        # Per-frame detections live here; data["frames"] only keeps frame metadata
+        self.detections = DetectionStore()
+        # CLIP embeddings of the sampled frames for the search index, not part of the exported results
+        self.frame_embeddings: Optional[np.ndarray] = None
+        self.embedding_model: Optional[str] = None
+        # Built on the first window query, dropped whenever tracks, scenes, speech or frames change
+        self._timeline: Optional[TimelineIndex] = None
     def add_video_metadata(self, info: Dict) -> None:
         self.data["video_metadata"] = {
             "fps": info['fps'],
@@ -23,71 +37,174 @@ class VideoAnalysisIntegrator:
             "duration": info['duration'],
             "resolution": f"{info['width']}x{info['height']}"
         }
+    # One row per sampled frame, in the order of data["frames"]
+    def add_frame_embeddings(self, embeddings: np.ndarray, model_name: str) -> None:
+        if len(embeddings) != len(self.data["frames"]):
+            raise ValueError(f"{len(embeddings)} embeddings for {len(self.data['frames'])} frames")
+        self.frame_embeddings = embeddings
+        self.embedding_model = model_name
     def add_audio_transcript(self, transcript_result: Dict) -> None:
+        self._timeline = None
         self.data["audio"] = {
             "language": transcript_result.get('language', 'unknown'),
             "full_transcript": transcript_result['text'],
             "segments": []
         }
         for segment in transcript_result.get('segments', []):
-            self.data["audio"]["segments"].append({
+            entry = {
                 "start": segment['start'],
                 "end": segment['end'],
                 "text": segment['text'].strip()
-            })
+            }
+            # Word timings, when the Whisper profile produced them
+            if segment.get('words'):
+                entry["words"] = [
+                    {"word": word['word'].strip(), "start": round(word['start'], 2), "end": round(word['end'], 2)}
+                    for word in segment['words']
+                ]
+            self.data["audio"]["segments"].append(entry)
+        # Voice activity: how much of the audio held speech and where
+        if 'speech' in transcript_result:
+            self.data["audio"]["speech"] = transcript_result['speech']
+    # start_frame and end_frame index the sampled frames, so add_frame_detections has to run first
+    # for the scene times to come from those frames' timestamps
     def add_scenes(self, scenes: List[Dict]) -> None:
+        self._timeline = None
         fps = self.data["video_metadata"].get("fps", 30)
+        duration = self.data["video_metadata"].get("duration", 0)
+        times = self.frame_times()
         for scene in scenes:
+            if len(times):
+                start_time = float(times[scene['start_frame']])
+                # A scene lasts until the next sampled frame, which opens the next scene
+                if scene['end_frame'] + 1 < len(times):
+                    end_time = float(times[scene['end_frame'] + 1])
+                else:
+                    end_time = max(float(duration), float(times[scene['end_frame']]))
+            else:
+                start_time = scene['start_frame'] / fps
+                end_time = scene['end_frame'] / fps
             self.data["scenes"].append({
                 "scene_number": scene['scene_number'],
                 "start_frame": scene['start_frame'],
                 "end_frame": scene['end_frame'],
-                "start_time": scene['start_frame'] / fps,
-                "end_time": scene['end_frame'] / fps,
+                "start_time": start_time,
+                "end_time": end_time,
                 "description": scene['description'],
                 "confidence": scene['confidence'],
                 "key_frame_path": scene['key_frame_path']
             })
     
-    def add_frame_detections(self, frame_paths: List[str], detections: Dict[str, List[Dict]]) -> None:
+    # frame_keys are frame paths, or source frame indices when frames were streamed from memory.
+    # frame_indices and timestamps give each sampled frame's source index and presentation time;
+    # without them int keys are taken as source indices and times are derived from fps.
+    def add_frame_detections(self, frame_keys: List[Union[str, int]], detections: Dict[Union[str, int], List[Dict]],
+                             frame_indices: Optional[List[int]] = None, timestamps: Optional[List[float]] = None) -> None:
+        self._timeline = None
         fps = self.data["video_metadata"].get("fps", 30)
-        for frame_idx, frame_path in enumerate(frame_paths):
-            frame_detections = detections.get(frame_path, [])
+        for frame_idx, frame_key in enumerate(frame_keys):
+            if frame_indices is not None:
+                source_frame = frame_indices[frame_idx]
+            else:
+                source_frame = frame_key if isinstance(frame_key, int) else None
+            if timestamps is not None:
+                timestamp = timestamps[frame_idx]
+            else:
+                timestamp = (source_frame if source_frame is not None else frame_idx) / fps
+            self.detections.add_frame(frame_idx, detections.get(frame_key, []))
             self.data["frames"].append({
                 "frame_index": frame_idx,
-                "timestamp": frame_idx / fps,
-                "frame_path": frame_path,
-                "detections": frame_detections
+                "source_frame": source_frame,
+                "timestamp": timestamp,
+                "frame_path": frame_key if isinstance(frame_key, str) else None
             })
+
+    def frame_times(self) -> np.ndarray:
+        return np.asarray([frame["timestamp"] for frame in self.data["frames"]], dtype=np.float64)
+
+    # Grouped reductions over the detection columns: rows are sorted by (track, frame)
+    # so every track is one contiguous run and each statistic is a single reduceat
     def compute_tracks_summary(self) -> None:
-        fps = self.data["video_metadata"].get("fps", 30)
-        tracks = {}
-        # Aggregate data across frames
-        for frame in self.data["frames"]:
-            for det in frame["detections"]:
-                track_id = det.get("track_id", -1)
-                if track_id == -1:
-                    continue
-                if track_id not in tracks:
-                    tracks[track_id] = {
-                        "class": det["class"],
-                        "first_frame": frame["frame_index"],
-                        "last_frame": frame["frame_index"],
-                        "confidences": [],
-                        "frame_count": 0
-                    }
-                tracks[track_id]["last_frame"] = frame["frame_index"]
-                tracks[track_id]["confidences"].append(det["confidence"])
-                tracks[track_id]["frame_count"] += 1
-        for track_id, data in tracks.items():
+        self._timeline = None
+        columns = self.detections.columns
+        tracked = columns["track_id"] != -1
+        if not tracked.any():
+            return
+        rows = np.flatnonzero(tracked)
+        # One int64 sort key (track in the high bits, frame in the low) sorts several times faster than lexsort
+        sort_key = (columns["track_id"][rows].astype(np.int64) << 32) | columns["frame_idx"][rows]
+        rows = rows[np.argsort(sort_key)]
+        track_ids = columns["track_id"][rows]
+        frames = columns["frame_idx"][rows]
+        class_ids = columns["class_id"][rows]
+        confidences = columns["confidence"][rows].astype(np.float64)
+        x1, y1, x2, y2 = (columns[name][rows].astype(np.float64) for name in ("x1", "y1", "x2", "y2"))
+
+        starts = np.flatnonzero(np.r_[True, track_ids[1:] != track_ids[:-1]])
+        ends = np.r_[starts[1:], len(track_ids)]
+        counts = ends - starts
+        first_frames = frames[starts]
+        last_frames = frames[ends - 1]
+        avg_confidences = np.add.reduceat(confidences, starts) / counts
+        max_confidences = np.maximum.reduceat(confidences, starts)
+        extents = np.stack([
+            np.minimum.reduceat(x1, starts), np.minimum.reduceat(y1, starts),
+            np.maximum.reduceat(x2, starts), np.maximum.reduceat(y2, starts)
+        ], axis=1)
+        avg_areas = np.add.reduceat((x2 - x1) * (y2 - y1), starts) / counts
+
+        # Motion path of the box centre; steps that cross from one track into the next are zeroed
+        centers_x = (x1 + x2) / 2
+        centers_y = (y1 + y2) / 2
+        steps = np.zeros(len(track_ids))
+        steps[:-1] = np.hypot(np.diff(centers_x), np.diff(centers_y))
+        steps[ends - 1] = 0.0
+        path_lengths = np.add.reduceat(steps, starts)
+        net_displacements = np.hypot(centers_x[ends - 1] - centers_x[starts], centers_y[ends - 1] - centers_y[starts])
+        times = self.frame_times()
+        first_appearances = times[first_frames]
+        last_appearances = times[last_frames]
+        durations = last_appearances - first_appearances
+        avg_speeds = np.divide(path_lengths, durations, out=np.zeros_like(path_lengths), where=durations > 0)
+
+        # Round and convert whole columns at once, then assemble the per-track dicts
+        start_centers = np.stack([centers_x[starts], centers_y[starts]], axis=1).round(2).tolist()
+        end_centers = np.stack([centers_x[ends - 1], centers_y[ends - 1]], axis=1).round(2).tolist()
+        per_track = zip(
+            track_ids[starts].tolist(), class_ids[starts].tolist(), first_appearances.tolist(), last_appearances.tolist(),
+            durations.tolist(), counts.tolist(), avg_confidences.round(4).tolist(), max_confidences.round(4).tolist(),
+            extents.round(2).tolist(), avg_areas.round(2).tolist(), start_centers, end_centers,
+            path_lengths.round(2).tolist(), net_displacements.round(2).tolist(), avg_speeds.round(2).tolist()
+        )
+        for (track_id, class_id, first_appearance, last_appearance, duration, count, avg_confidence, max_confidence,
+             extent, avg_area, start_center, end_center, path_length, net_displacement, avg_speed) in per_track:
             self.data["tracks"][str(track_id)] = {
-                "class": data["class"],
-                "first_appearance": data["first_frame"] / fps,
-                "last_appearance": data["last_frame"] / fps,
-                "duration": (data["last_frame"] - data["first_frame"]) / fps,
-                "total_frames": data["frame_count"],
-                "avg_confidence": sum(data["confidences"]) / len(data["confidences"])
+                "class": self.detections.class_names[class_id],
+                "first_appearance": first_appearance,
+                "last_appearance": last_appearance,
+                "duration": duration,
+                "total_frames": count,
+                "avg_confidence": avg_confidence,
+                "max_confidence": max_confidence,
+                "bbox_extent": extent,
+                "avg_box_area": avg_area,
+                "motion": {
+                    "start_center": start_center,
+                    "end_center": end_center,
+                    "path_length": path_length,
+                    "net_displacement": net_displacement,
+                    # Pixels per second along the path
+                    "avg_speed": avg_speed
+                }
             }
+    def timeline(self) -> TimelineIndex:
+        if self._timeline is None:
+            self._timeline = TimelineIndex(self.data)
+        return self._timeline
+
+    # Tracks, scenes and speech segments (or any of TIMELINE_KINDS) overlapping [start, end] seconds
+    def window(self, start: float, end: float, kinds: Sequence[str] = DEFAULT_WINDOW_KINDS) -> Dict:
+        return self.timeline().window(start, end, kinds)
     def generate_summary(self) -> None:
         scene_desc = self.data["scenes"][0]["description"] if self.data["scenes"] else "Unknown scene"
         transcript_preview = self.data["audio"]["full_transcript"][:200] if self.data["audio"] else ""
@@ -116,10 +233,81 @@ class VideoAnalysisIntegrator:
             "key_moments": key_moments
         }
     
-    def export_json(self, output_path: str) -> None:
+    # Full JSON view with detections nested under each frame, as the results were originally laid out
+    def export_json(self, output_path: str, include_detections: bool = True) -> None:
         with open(output_path, 'w') as f:
-            json.dump(self.data, f, indent=2)
+            json.dump(self.get_data(include_detections), f, indent=2)
         print(f"Analysis exported to {output_path}")
+
+    # Compact export: the JSON leaves detections out and points at an .npz holding them as columns
+    def export(self, output_path: str, detections_path: str) -> None:
+        self.detections.save(detections_path)
+        data = dict(self.data)
+        data["detections_file"] = os.path.relpath(detections_path, os.path.dirname(os.path.abspath(output_path)))
+        with open(output_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        print(f"Analysis exported to {output_path} (detections in {detections_path})")
     
-    def get_data(self) -> Dict:
-        return self.data
\ No newline at end of file
+    def get_data(self, include_detections: bool = True) -> Dict:
+        if not include_detections:
+            return self.data
+        return attach_detections(self.data, self.detections)
+
+
+def attach_detections(data: Dict, store: DetectionStore) -> Dict:
+    by_frame = store.detections_by_frame([frame["frame_index"] for frame in data["frames"]])
+    data = dict(data)
+    data["frames"] = [dict(frame, detections=by_frame[frame["frame_index"]]) for frame in data["frames"]]
+    return data
+
+
+# Results JSON without its detections, and the path of the detections file it points at
+# (None for a full JSON view from export_json)
+def read_results(result_path: str) -> Tuple[Dict, Optional[str]]:
+    with open(result_path, 'r') as f:
+        data = json.load(f)
+    detections_file: Optional[str] = data.pop("detections_file", None)
+    if detections_file:
+        return data, os.path.join(os.path.dirname(result_path), detections_file)
+    return data, None
+
+
+# Reads results written by export() or export_json(); detections are only loaded when asked for
+def load_results(result_path: str, include_detections: bool = True) -> Dict:
+    data, detections_path = read_results(result_path)
+    if include_detections and detections_path:
+        data = attach_detections(data, DetectionStore.load(detections_path))
+    return data
+
+
+# A view of results holding only the given top-level fields, with frames and audio segments
+# cut to [offset, offset + limit) and detections attached to the frames of that page alone.
+# data is left as it is, so it can come from a cache.
+def select_results(data: Dict, fields: Optional[Sequence[str]] = None, offset: int = 0, limit: Optional[int] = None,
+                   store: Optional[DetectionStore] = None, include_detections: bool = True) -> Dict:
+    if fields is None:
+        fields = [field for field in RESULT_FIELDS if field in data]
+    unknown = [field for field in fields if field not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown result field: {', '.join(unknown)} (expected one of {', '.join(RESULT_FIELDS)})")
+    if offset < 0 or (limit is not None and limit < 1):
+        raise ValueError("Pagination needs offset >= 0 and limit >= 1")
+    end = None if limit is None else offset + limit
+    view: Dict = {}
+    pagination: Dict = {}
+    for field in fields:
+        value = data.get(field)
+        if field == "frames" and value is not None:
+            pagination["frames_total"] = len(value)
+            value = value[offset:end]
+            if include_detections and store is not None:
+                value = attach_detections({"frames": value}, store)["frames"]
+            elif not include_detections:
+                value = [{key: item for key, item in frame.items() if key != "detections"} for frame in value]
+        elif field == "audio" and value and "segments" in value:
+            pagination["segments_total"] = len(value["segments"])
+            value = dict(value, segments=value["segments"][offset:end])
+        view[field] = value
+    if pagination and (offset or limit is not None):
+        view["pagination"] = dict(pagination, offset=offset, limit=limit)
+    return view
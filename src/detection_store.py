@@ -0,0 +1,121 @@
+import numpy as np
+from typing import Dict, List
+
+COLUMN_DTYPES = {
+    "frame_idx": np.int32,
+    "class_id": np.int16,
+    "confidence": np.float32,
+    "x1": np.float32,
+    "y1": np.float32,
+    "x2": np.float32,
+    "y2": np.float32,
+    "track_id": np.int32,
+}
+
+
+# Detections for a whole video held as one NumPy array per field instead of a
+# dict per detection. Class names are stored once and referenced by class_id.
+# Rows are kept in the order frames were added, so each frame is a contiguous slice.
+class DetectionStore:
+    def __init__(self):
+        self.class_names: List[str] = []
+        self.class_ids: Dict[str, int] = {}
+        self._chunks: List[Dict[str, np.ndarray]] = []
+        self._columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+    def __len__(self) -> int:
+        return len(self._columns["frame_idx"]) + sum(len(chunk["frame_idx"]) for chunk in self._chunks)
+
+    def class_id(self, class_name: str) -> int:
+        if class_name not in self.class_ids:
+            self.class_ids[class_name] = len(self.class_names)
+            self.class_names.append(class_name)
+        return self.class_ids[class_name]
+
+    def add_frame(self, frame_idx: int, detections: List[Dict]) -> None:
+        if not detections:
+            return
+        bboxes = np.asarray([det['bbox'] for det in detections], dtype=np.float32).reshape(-1, 4)
+        self._chunks.append({
+            "frame_idx": np.full(len(detections), frame_idx, dtype=COLUMN_DTYPES["frame_idx"]),
+            "class_id": np.asarray([self.class_id(det['class']) for det in detections], dtype=COLUMN_DTYPES["class_id"]),
+            "confidence": np.asarray([det['confidence'] for det in detections], dtype=COLUMN_DTYPES["confidence"]),
+            "x1": bboxes[:, 0],
+            "y1": bboxes[:, 1],
+            "x2": bboxes[:, 2],
+            "y2": bboxes[:, 3],
+            "track_id": np.asarray([det.get('track_id', -1) for det in detections], dtype=COLUMN_DTYPES["track_id"]),
+        })
+
+    # Frames are appended as small chunks and joined into single arrays the first time they're read
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._chunks:
+            self._columns = {
+                name: np.concatenate([self._columns[name]] + [chunk[name] for chunk in self._chunks])
+                for name in COLUMN_DTYPES
+            }
+            self._chunks = []
+        return self._columns
+
+    def frame_rows(self, frame_idx: int) -> slice:
+        frame_column = self.columns["frame_idx"]
+        start = int(np.searchsorted(frame_column, frame_idx, side="left"))
+        end = int(np.searchsorted(frame_column, frame_idx, side="right"))
+        return slice(start, end)
+
+    # Dict view of a range of rows, in the same shape the detectors produce
+    def to_dicts(self, rows: slice = slice(None)) -> List[Dict]:
+        columns = {name: values[rows] for name, values in self.columns.items()}
+        # Rounding hides float32 noise (0.9 -> 0.8999999761) in the JSON view
+        columns = {
+            name: (values.astype(np.float64).round(4 if name == "confidence" else 2) if values.dtype == np.float32 else values).tolist()
+            for name, values in columns.items()
+        }
+        return [
+            {
+                'class': self.class_names[class_id],
+                'confidence': confidence,
+                'bbox': [x1, y1, x2, y2],
+                'track_id': track_id
+            }
+            for class_id, confidence, x1, y1, x2, y2, track_id in zip(
+                columns["class_id"], columns["confidence"], columns["x1"], columns["y1"],
+                columns["x2"], columns["y2"], columns["track_id"]
+            )
+        ]
+
+    def frame_detections(self, frame_idx: int) -> List[Dict]:
+        return self.to_dicts(self.frame_rows(frame_idx))
+
+    # Detections grouped by frame, for every frame index in frame_indices (frames without detections get [])
+    def detections_by_frame(self, frame_indices: List[int]) -> Dict[int, List[Dict]]:
+        frame_column = self.columns["frame_idx"]
+        frame_indices = np.asarray(frame_indices, dtype=COLUMN_DTYPES["frame_idx"])
+        starts = np.searchsorted(frame_column, frame_indices, side="left").tolist()
+        ends = np.searchsorted(frame_column, frame_indices, side="right").tolist()
+        if not starts:
+            return {}
+        # Only the rows spanned by the requested frames are converted, so a page of frames costs a page of rows
+        first = min(starts)
+        detections = self.to_dicts(slice(first, max(ends)))
+        return {
+            frame_idx: detections[start - first:end - first]
+            for frame_idx, start, end in zip(frame_indices.tolist(), starts, ends)
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], class_names: List[str]) -> "DetectionStore":
+        store = cls()
+        store.class_names = list(class_names)
+        store.class_ids = {name: i for i, name in enumerate(store.class_names)}
+        store._columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+        return store
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, class_names=np.asarray(self.class_names, dtype=str), **self.columns)
+
+    @classmethod
+    def load(cls, path: str) -> "DetectionStore":
+        with np.load(path) as data:
+            return cls.from_columns({name: data[name] for name in COLUMN_DTYPES}, data["class_names"].tolist())
@@ -0,0 +1,236 @@
+import fcntl
+import json
+import os
+import re
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+FRAME_INDEX_DIR = os.getenv("FRAME_INDEX_DIR", "models/frame_index")
+# Exact search costs about a microsecond or two per frame, past this many IVF takes over
+FRAME_INDEX_IVF_MIN_ROWS = int(os.getenv("FRAME_INDEX_IVF_MIN_ROWS", "50000"))
+SEARCH_MODES = ("auto", "exact", "ivf")
+
+EMBEDDINGS_FILE = "embeddings.f16"
+TIMESTAMPS_FILE = "timestamps.f64"
+META_FILE = "meta.json"
+
+
+# Spherical k-means: centroids stay unit length so a dot product ranks them like the rows
+def train_centroids(data: np.ndarray, num_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), num_lists, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        # An empty list keeps its old centroid
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids
+
+
+# Normalized CLIP embeddings of the sampled frames of every analyzed job, one index per
+# CLIP model. Rows are appended to raw float16 (embeddings) and float64 (timestamps)
+# files that searches memory-map, so the matrix never has to fit in RAM, and meta.json
+# records how many rows are committed and which job each range of rows belongs to.
+# Past ivf_min_rows an inverted file groups the rows by nearest k-means centroid, and an
+# ivf search only scores the rows in the nprobe lists closest to the query. Workers in
+# separate processes append under a file lock.
+class FrameIndex:
+    def __init__(self, root: str = FRAME_INDEX_DIR, model_name: str = "ViT-B/32",
+                 ivf_min_rows: int = FRAME_INDEX_IVF_MIN_ROWS, block_rows: int = 4096):
+        self.model_name = model_name
+        self.root = os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]", "-", model_name))
+        self.ivf_min_rows = ivf_min_rows
+        self.block_rows = block_rows
+        self._view = None
+        self._view_stamp = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load_meta(self) -> Dict:
+        try:
+            with open(self._path(META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"model": self.model_name, "dim": None, "count": 0, "jobs": [], "ivf": None}
+
+    def _write_meta(self, meta: Dict) -> None:
+        path = self._path(META_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return self.load_meta()["count"]
+
+    def add(self, job_id: str, embeddings: np.ndarray, timestamps: np.ndarray) -> int:
+        if len(embeddings) != len(timestamps):
+            raise ValueError(f"{len(embeddings)} embeddings for {len(timestamps)} timestamps")
+        if len(embeddings) == 0:
+            return 0
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float16)
+        with self._lock():
+            meta = self.load_meta()
+            if any(job["job_id"] == job_id for job in meta["jobs"]):
+                print(f"Job {job_id} is already in the frame index")
+                return 0
+            if meta["dim"] is None:
+                meta["dim"] = embeddings.shape[1]
+            elif embeddings.shape[1] != meta["dim"]:
+                raise ValueError(f"Embedding size {embeddings.shape[1]} doesn't match the index ({meta['dim']})")
+            count = meta["count"]
+            self._append(EMBEDDINGS_FILE, embeddings, count)
+            self._append(TIMESTAMPS_FILE, np.asarray(timestamps, dtype=np.float64), count)
+            meta["count"] = count + len(embeddings)
+            meta["jobs"].append({"job_id": job_id, "start": count, "end": meta["count"]})
+            old_ivf = meta["ivf"]
+            # The right number of lists grows with the index, so the centroids are retrained
+            # each time it doubles; in between new rows join their nearest existing list
+            if meta["count"] >= self.ivf_min_rows and (old_ivf is None or meta["count"] >= 2 * old_ivf["count"]):
+                meta["ivf"] = self._build_ivf(meta)
+            elif old_ivf is not None:
+                centroids = np.load(self._path(old_ivf["centroids"]))
+                lists = np.argmax(embeddings.astype(np.float32) @ centroids.T, axis=1).astype(np.int32)
+                self._append(old_ivf["assignments"], lists, count)
+            self._write_meta(meta)
+            if old_ivf is not None and meta["ivf"] is not old_ivf:
+                for name in (old_ivf["centroids"], old_ivf["assignments"]):
+                    os.remove(self._path(name))
+        print(f"Indexed {len(embeddings)} frames of job {job_id} ({meta['count']} frames in the index)")
+        return len(embeddings)
+
+    def _append(self, name: str, data: np.ndarray, count: int) -> None:
+        with open(self._path(name), "ab") as f:
+            # Drop anything a crashed writer appended without committing it to meta.json
+            f.truncate(count * data[0].nbytes)
+            f.write(data.tobytes())
+
+    # k-means on a sample of the rows, then every row is assigned to its nearest list
+    def _build_ivf(self, meta: Dict, sample_per_list: int = 64) -> Dict:
+        count, dim = meta["count"], meta["dim"]
+        num_lists = max(int(np.sqrt(count)), 16)
+        print(f"Building IVF over {count} frames with {num_lists} lists")
+        embeddings = np.memmap(self._path(EMBEDDINGS_FILE), dtype=np.float16, mode="r", shape=(count, dim))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(count, min(count, num_lists * sample_per_list), replace=False))
+        centroids = train_centroids(embeddings[sample].astype(np.float32), num_lists)
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, self.block_rows):
+            block = embeddings[start:start + self.block_rows].astype(np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        # Named after the build so searches holding the previous meta.json keep matching files
+        centroids_name = f"ivf_{count}.npy"
+        assignments_name = f"lists_{count}.i32"
+        for name, data in ((centroids_name, centroids), (assignments_name, assignments)):
+            tmp_path = self._path(f"{name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                if name.endswith(".npy"):
+                    np.save(f, data)
+                else:
+                    f.write(data.tobytes())
+            os.replace(tmp_path, self._path(name))
+        return {"centroids": centroids_name, "assignments": assignments_name, "count": count, "lists": num_lists}
+
+    # Memory maps of the committed rows, reopened when another process commits more
+    def _open(self) -> Optional[Tuple[Dict, np.ndarray, np.ndarray, Optional[Dict]]]:
+        try:
+            stamp = os.stat(self._path(META_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if stamp != self._view_stamp:
+            meta = self.load_meta()
+            if meta["count"] == 0:
+                return None
+            embeddings = np.memmap(self._path(EMBEDDINGS_FILE), dtype=np.float16, mode="r",
+                                   shape=(meta["count"], meta["dim"]))
+            timestamps = np.memmap(self._path(TIMESTAMPS_FILE), dtype=np.float64, mode="r", shape=(meta["count"],))
+            ivf = None
+            if meta["ivf"]:
+                try:
+                    centroids = np.load(self._path(meta["ivf"]["centroids"]))
+                    assignments = np.fromfile(self._path(meta["ivf"]["assignments"]), dtype=np.int32, count=meta["count"])
+                    # Row ids grouped by list, each list a contiguous run
+                    ivf = {
+                        "centroids": centroids,
+                        "order": np.argsort(assignments, kind="stable"),
+                        "offsets": np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=len(centroids)))))
+                    }
+                except FileNotFoundError:
+                    # Replaced by a rebuild since meta.json was read, the next search picks up the new lists
+                    stamp = None
+            self._view = (meta, embeddings, timestamps, ivf)
+            self._view_stamp = stamp
+        return self._view
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[keep], scores[keep]
+        return rows, scores
+
+    # Ranked hits for a query embedding in the same CLIP space: exact scores every row a
+    # block at a time, ivf only the rows in the nprobe nearest lists
+    def search(self, query: np.ndarray, k: int = 10, mode: str = "auto", nprobe: int = 16) -> List[Dict]:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode} (expected one of {', '.join(SEARCH_MODES)})")
+        view = self._open()
+        if view is None:
+            return []
+        meta, embeddings, timestamps, ivf = view
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / np.linalg.norm(query)
+        count = meta["count"]
+        if mode == "auto":
+            mode = "ivf" if ivf is not None else "exact"
+        if mode == "ivf" and ivf is None:
+            print("No IVF lists built yet, searching exactly")
+            mode = "exact"
+
+        if mode == "exact":
+            rows = np.empty(0, dtype=np.int64)
+            scores = np.empty(0, dtype=np.float32)
+            # Converting float16 to float32 costs more than the dot products, so it goes through
+            # one block-sized buffer that stays in cache instead of a fresh array per block
+            buffer = np.empty((min(self.block_rows, count), meta["dim"]), dtype=np.float32)
+            for start in range(0, count, self.block_rows):
+                block = embeddings[start:start + self.block_rows]
+                np.copyto(buffer[:len(block)], block)
+                block_scores = buffer[:len(block)] @ query
+                block_rows = np.arange(start, start + len(block))
+                rows, scores = self._top_k(np.concatenate((rows, block_rows)), np.concatenate((scores, block_scores)), k)
+        else:
+            lists = np.argsort(-(ivf["centroids"] @ query))[:nprobe]
+            offsets = ivf["offsets"]
+            candidates = [ivf["order"][offsets[i]:offsets[i + 1]] for i in lists]
+            # Sorted rows read the memory map front to back
+            rows = np.sort(np.concatenate(candidates))
+            scores = embeddings[rows].astype(np.float32) @ query
+            rows, scores = self._top_k(rows, scores, k)
+
+        order = np.argsort(-scores)
+        rows, scores = rows[order], scores[order]
+        starts = np.array([job["start"] for job in meta["jobs"]])
+        owners = np.searchsorted(starts, rows, side="right") - 1
+        return [
+            {
+                "job_id": meta["jobs"][owner]["job_id"],
+                "timestamp": round(float(timestamps[row]), 3),
+                "score": round(float(score), 4)
+            }
+            for row, owner, score in zip(rows, owners, scores)
+        ]
@@ -0,0 +1,245 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+JOB_COLUMNS = [
+    "job_id", "status", "progress", "message", "filename", "file_path", "upload_time",
+    "queued_at", "started_at", "completion_time", "result_path", "error", "worker_pid",
+    "attempts", "config", "content_hash"
+]
+
+
+# Durable job table shared by the API process and the worker processes
+class JobStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    filename TEXT,
+                    file_path TEXT,
+                    upload_time TEXT,
+                    queued_at REAL,
+                    started_at REAL,
+                    completion_time TEXT,
+                    result_path TEXT,
+                    error TEXT,
+                    worker_pid INTEGER,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    config TEXT,
+                    content_hash TEXT
+                )
+            """)
+            # Databases created before content hashes were tracked
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "content_hash" not in existing:
+                conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, queued_at)")
+            # Resumable upload sessions, so a client can continue after a dropped connection or restart
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    upload_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_hash TEXT,
+                    temp_path TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            # Progress events the workers record and /events streams to clients, oldest first per job
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_events (
+                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, event_id)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _to_job(self, row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["config"] = json.loads(job["config"]) if job["config"] else {}
+        return job
+
+    def create(self, job: Dict) -> None:
+        fields = {key: value for key, value in job.items() if key in JOB_COLUMNS}
+        if "config" in fields:
+            fields["config"] = json.dumps(fields["config"])
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        with self._connect() as conn:
+            conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", list(fields.values()))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def update(self, job_id: str, **fields) -> None:
+        if "config" in fields:
+            fields["config"] = json.dumps(fields["config"])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", list(fields.values()) + [job_id])
+
+    # Records a progress event and applies job_fields (progress, message, ...) to the job in the same transaction
+    def add_event(self, job_id: str, event: Dict, **job_fields) -> int:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT INTO job_events (job_id, created_at, data) VALUES (?, ?, ?)",
+                (job_id, time.time(), json.dumps(event))
+            )
+            if job_fields:
+                assignments = ", ".join(f"{key} = ?" for key in job_fields)
+                conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", list(job_fields.values()) + [job_id])
+            conn.execute("COMMIT")
+        return cursor.lastrowid
+
+    # Events of a job recorded after event after_id, each with its id
+    def events_after(self, job_id: str, after_id: int = 0, limit: int = 500) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT event_id, created_at, data FROM job_events WHERE job_id = ? AND event_id > ? "
+                "ORDER BY event_id LIMIT ?",
+                (job_id, after_id, limit)
+            ).fetchall()
+        return [dict(json.loads(row["data"]), id=row["event_id"], time=row["created_at"]) for row in rows]
+
+    # Once a job has completed or failed only the last event of each stage (and the final
+    # status event, which has no stage) is worth replaying, so the per-frame progress events
+    # are deleted. Every finished job when job_id is None. Returns how many events went.
+    def compact_events(self, job_id: Optional[str] = None) -> int:
+        finished = "SELECT job_id FROM jobs WHERE status IN ('completed', 'failed')"
+        latest = "SELECT MAX(event_id) FROM job_events"
+        params: List = []
+        if job_id is not None:
+            finished += " AND job_id = ?"
+            latest += " WHERE job_id = ?"
+            params = [job_id, job_id]
+        latest += " GROUP BY job_id, json_extract(data, '$.stage')"
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM job_events WHERE job_id IN ({finished}) AND event_id NOT IN ({latest})", params
+            )
+        return cursor.rowcount
+
+    def create_upload(self, upload: Dict) -> None:
+        columns = ", ".join(upload)
+        placeholders = ", ".join("?" for _ in upload)
+        with self._connect() as conn:
+            conn.execute(f"INSERT INTO uploads ({columns}) VALUES ({placeholders})", list(upload.values()))
+
+    def get_upload(self, upload_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        return dict(row) if row else None
+
+    def uploads_created_before(self, cutoff: float) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM uploads WHERE created_at < ?", (cutoff,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_upload(self, upload_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+
+    # Moves a pending job to the queue unless the queue is already max_depth long. Returns
+    # "queued", "full", or "conflict" when the job is no longer pending: a repeated request
+    # must not put a job a worker already claimed back in the queue.
+    def enqueue(self, job_id: str, config: Dict, max_depth: int) -> str:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if depth >= max_depth:
+                conn.execute("ROLLBACK")
+                return "full"
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', queued_at = ?, config = ?, message = ? "
+                "WHERE job_id = ? AND status = 'pending'",
+                (time.time(), json.dumps(config), "Waiting for a worker", job_id)
+            )
+            if cursor.rowcount != 1:
+                conn.execute("ROLLBACK")
+                return "conflict"
+            conn.execute("COMMIT")
+        return "queued"
+
+    def queue_depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    # 1 means the job is next in line, None means it isn't queued
+    def queue_position(self, job_id: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT status, queued_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] != "queued":
+                return None
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND queued_at < ?", (row["queued_at"],)
+            ).fetchone()[0]
+        return ahead + 1
+
+    # Atomically hands the oldest queued job to a worker
+    def claim_next(self, worker_pid: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY queued_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', worker_pid = ?, started_at = ?, attempts = attempts + 1 "
+                "WHERE job_id = ?",
+                (worker_pid, time.time(), row["job_id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+            conn.execute("COMMIT")
+        return self._to_job(job)
+
+    # Puts jobs left in 'processing' by a dead worker (or every worker, after a crash) back in the queue
+    def requeue_in_flight(self, worker_pids: Optional[List[int]] = None, max_attempts: int = 3) -> int:
+        query = "SELECT job_id, attempts FROM jobs WHERE status = 'processing'"
+        params: List = []
+        if worker_pids is not None:
+            query += f" AND worker_pid IN ({', '.join('?' for _ in worker_pids)})"
+            params = list(worker_pids)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(query, params).fetchall()
+            for row in rows:
+                if row["attempts"] >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, message = ? WHERE job_id = ?",
+                        ("Worker crashed too many times", "Analysis failed: worker crashed", row["job_id"])
+                    )
+                else:
+                    # Keep the original queued_at so recovered jobs go back to the front of the queue
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', progress = 0, worker_pid = NULL, message = ? "
+                        "WHERE job_id = ?",
+                        ("Recovered after a worker restart, waiting for a worker", row["job_id"])
+                    )
+            conn.execute("COMMIT")
+        return len(rows)
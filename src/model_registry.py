@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+# Loads each model once per process and hands it out to one job at a time
+class ModelRegistry:
+    def __init__(self):
+        self._models: Dict[Tuple, Any] = {}
+        self._locks: Dict[Tuple, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def get(self, key: Tuple, factory: Callable[[], Any]) -> Any:
+        with self._registry_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+        # Load under the model's own lock so one slow load doesn't block the others
+        with self._locks[key]:
+            if key not in self._models:
+                self._models[key] = factory()
+            return self._models[key]
+
+    @contextmanager
+    def acquire(self, key: Tuple, factory: Callable[[], Any]) -> Iterator[Any]:
+        model = self.get(key, factory)
+        with self._locks[key]:
+            yield model
+
+    @contextmanager
+    def tracker(self, model_name: str = 'yolov8n.pt', confidence_threshold: float = 0.5,
+                imgsz: Optional[int] = None, tiled: bool = False, tile_overlap: float = 0.2):
+        from src.object_tracking import ObjectTracker
+        key = ('tracker', model_name)
+        with self.acquire(key, lambda: ObjectTracker(model_name=model_name)) as tracker:
+            # Tracks persist inside the model between calls, so every job starts from a clean tracker
+            tracker.reset_tracks()
+            tracker.confidence_threshold = confidence_threshold
+            # Inference settings are per job, the loaded model is shared
+            tracker.imgsz = imgsz
+            tracker.tiled = tiled
+            tracker.tile_overlap = tile_overlap
+            try:
+                yield tracker
+            finally:
+                tracker.reset_tracks()
+
+    @contextmanager
+    def transcriber(self, model_name: str = 'base', quantize: bool = False):
+        from src.audio_processing import AudioTranscriber
+        # The quantized model is a separate copy of the weights
+        key = ('whisper', model_name, quantize)
+        with self.acquire(key, lambda: AudioTranscriber(model_name=model_name, quantize=quantize)) as transcriber:
+            yield transcriber
+
+    @contextmanager
+    def scene_analyzer(self, model_name: str = 'ViT-B/32'):
+        from src.scene_understanding import SceneAnalyzer
+        with self.acquire(('clip', model_name), lambda: SceneAnalyzer(model_name=model_name)) as analyzer:
+            yield analyzer
+
+    # Loads and runs each named model once, None skips that model
+    def warmup(self, tracker_model: Optional[str] = 'yolov8n.pt', whisper_model: Optional[str] = 'base',
+               clip_model: Optional[str] = 'ViT-B/32', whisper_quantize: bool = False) -> None:
+        print("Warming up models")
+        blank = np.zeros((640, 640, 3), dtype=np.uint8)
+        if tracker_model:
+            with self.tracker(tracker_model) as tracker:
+                tracker.track_frame(blank)
+        if clip_model:
+            with self.scene_analyzer(clip_model) as analyzer:
+                analyzer.describe_image(blank)
+        if whisper_model:
+            with self.transcriber(whisper_model, whisper_quantize) as transcriber:
+                transcriber.model.transcribe(np.zeros(16000, dtype=np.float32), verbose=None)
+        print("Models ready")
+
+
+# Shared by every job that runs in this process
+registry = ModelRegistry()
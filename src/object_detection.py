@@ -1,36 +1,48 @@
 from ultralytics import YOLO
-from typing import List, Dict
+from typing import List, Dict, Union
+import numpy as np
 import cv2 
 
+# Convert ultralytics boxes to per-detection dicts, pulling each tensor to numpy once
+def boxes_to_detections(boxes, names: Dict[int, str]) -> List[Dict]:
+    if boxes is None or len(boxes) == 0:
+        return []
+    xyxy = boxes.xyxy.cpu().numpy().tolist()
+    confidences = boxes.conf.cpu().numpy().tolist()
+    class_ids = boxes.cls.cpu().numpy().astype(int).tolist()
+    return [
+        {'class': names[class_id], 'confidence': confidence, 'bbox': bbox}
+        for class_id, confidence, bbox in zip(class_ids, confidences, xyxy)
+    ]
+
+def result_to_detections(result) -> List[Dict]:
+    return boxes_to_detections(result.boxes, result.names)
+
 class ObjectDetector:
-    def __init__(self, model_name: str = 'yolov8n.pt', confidence_threshold: float = 0.5):
+    def __init__(self, model_name: str = 'yolov8n.pt', confidence_threshold: float = 0.5, batch_size: int = 8):
         print(f"Loading YOLO model: {model_name}")
         self.model = YOLO(model_name)
         self.confidence_threshold = confidence_threshold
+        self.batch_size = batch_size
         print(f"Model Loaded")
     
-    def detect_objects(self, image_path: str) -> List[Dict]:
+    def detect_objects(self, image_path: Union[str, np.ndarray]) -> List[Dict]:
         results = self.model(image_path, conf=self.confidence_threshold, verbose=False)
         detections = []
         for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                detection = {
-                    'class': result.names[int(box.cls[0])],
-                    'confidence': float(box.conf[0]),
-                    'bbox': box.xyxy[0].cpu().numpy().tolist()
-                }
-                detections.append(detection)
+            detections.extend(result_to_detections(result))
         return detections
     
-    def detect_in_frames(self, frame_paths: List[str]) -> Dict[str, List[Dict]]:
+    def detect_in_frames(self, frame_paths: List[str], batch_size: int = None) -> Dict[str, List[Dict]]:
+        batch_size = batch_size or self.batch_size
         results = {}
         print(f"Running object detection on {len(frame_paths)} frames")
-        for i, frame_path in enumerate(frame_paths):
-            detections = self.detect_objects(frame_path)
-            results[frame_path] = detections
-            if (i + 1) % 10 == 0:  # Print every 10 frames to reduce clutter
-                print(f"Frame {i+1}/{len(frame_paths)}: {len(detections)} objects detected")
+        for start in range(0, len(frame_paths), batch_size):
+            batch = frame_paths[start:start + batch_size]
+            batch_results = self.model(batch, conf=self.confidence_threshold, verbose=False)
+            for frame_path, result in zip(batch, batch_results):
+                results[frame_path] = result_to_detections(result)
+            print(f"Frame {start + len(batch)}/{len(frame_paths)}: {sum(len(results[p]) for p in batch)} objects detected")
         return results
     
 
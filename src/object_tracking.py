@@ -1,43 +1,163 @@
+import cv2
+import torch
+from torchvision.ops import batched_nms
 from ultralytics import YOLO
-from typing import List, Dict, Optional
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.bot_sort import BOTSORT
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+from typing import List, Dict, Optional, Union, Iterable, Iterator, Tuple
+import numpy as np
+from src.object_detection import boxes_to_detections
+
+# Tile size used by tiled inference when no inference size is set
+DEFAULT_TILE_SIZE = 640
+
+
+# Top-left corners of tile x tile windows covering the frame, neighbours overlapping by
+# the given fraction. The last row and column are pushed back to sit flush with the edges.
+def tile_origins(width: int, height: int, tile: int, overlap: float) -> List[Tuple[int, int]]:
+    stride = max(int(tile * (1.0 - overlap)), 1)
+    def starts(length: int) -> List[int]:
+        if length <= tile:
+            return [0]
+        positions = list(range(0, length - tile, stride))
+        return positions + [length - tile]
+    return [(x, y) for y in starts(height) for x in starts(width)]
 
 class ObjectTracker:
-    def __init__(self, model_name: str = 'yolov8n.pt', confidence_threshold: float = 0.5):
+    # imgsz is the inference resolution (None keeps the model's default). In tiled mode every
+    # frame is also cut into overlapping imgsz tiles so small objects in 4K footage keep enough
+    # pixels, and boxes from the tiles and the whole frame are merged with class-aware NMS.
+    def __init__(self, model_name: str = 'yolov8n.pt', confidence_threshold: float = 0.5,
+                 batch_size: int = 8, tracker_config: str = 'botsort.yaml', imgsz: Optional[int] = None,
+                 tiled: bool = False, tile_overlap: float = 0.2, nms_iou: float = 0.5):
         self.model = YOLO(model_name)
         self.confidence_threshold = confidence_threshold
+        self.batch_size = batch_size
+        self.tracker_config = tracker_config
+        self.imgsz = imgsz
+        self.tiled = tiled
+        self.tile_overlap = tile_overlap
+        self.nms_iou = nms_iou
+        self.tracker = None
+
+    def _create_tracker(self):
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(self.tracker_config)))
+        tracker_class = BOTSORT if cfg.tracker_type == 'botsort' else BYTETracker
+        return tracker_class(args=cfg, frame_rate=30)
+
+    # Tracks live in self.tracker between calls, clear them before reusing the model for another video
+    def reset_tracks(self) -> None:
+        self.tracker = None
+
+    def _predict(self, sources: List[Union[str, np.ndarray]]) -> list:
+        kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+        return self.model.predict(sources, conf=self.confidence_threshold, verbose=False, **kwargs)
+
+    # Runs the model on every tile of every frame plus each whole frame (for objects larger than a tile),
+    # shifts tile boxes into frame coordinates and merges the overlaps. Returns one Boxes per frame.
+    def _detect_tiled(self, frames: List[np.ndarray]) -> Tuple[List[Boxes], Dict[int, str]]:
+        tile = self.imgsz or DEFAULT_TILE_SIZE
+        crops, owners, offsets = [], [], []
+        for i, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            if max(width, height) > tile:
+                for x, y in tile_origins(width, height, tile, self.tile_overlap):
+                    crops.append(frame[y:y + tile, x:x + tile])
+                    owners.append(i)
+                    offsets.append((x, y))
+            crops.append(frame)
+            owners.append(i)
+            offsets.append((0, 0))
+        per_frame = [[] for _ in frames]
+        names = self.model.names
+        # Tiles go through the model in chunks so a batch of 4K frames doesn't become one huge batch
+        chunk = self.batch_size * 4
+        for start in range(0, len(crops), chunk):
+            results = self._predict(crops[start:start + chunk])
+            for result, owner, (x, y) in zip(results, owners[start:start + chunk], offsets[start:start + chunk]):
+                data = result.boxes.data[:, :6].clone()
+                data[:, [0, 2]] += x
+                data[:, [1, 3]] += y
+                per_frame[owner].append(data)
+        merged = []
+        for frame, parts in zip(frames, per_frame):
+            data = torch.cat(parts)
+            keep = batched_nms(data[:, :4], data[:, 4], data[:, 5].long(), self.nms_iou)
+            merged.append(Boxes(data[keep], frame.shape[:2]))
+        return merged, names
+
+    # Detection runs batched, association then runs frame by frame in order.
+    # scale maps boxes from the frames given back to source resolution, for frames
+    # that were downscaled at decode time; tracking itself runs in frame coordinates.
+    def track_frames(self, sources: List[Union[str, np.ndarray]], scale: float = 1.0) -> List[List[Dict]]:
+        if self.tracker is None:
+            self.tracker = self._create_tracker()
+        if self.tiled:
+            frames = [cv2.imread(source) if isinstance(source, str) else source for source in sources]
+            frame_boxes, names = self._detect_tiled(frames)
+        else:
+            results = self._predict(sources)
+            frames = [result.orig_img for result in results]
+            frame_boxes = [result.boxes for result in results]
+            names = results[0].names if results else self.model.names
+        batch_detections = []
+        for boxes, frame in zip(frame_boxes, frames):
+            tracks = self.tracker.update(boxes.cpu().numpy(), frame)
+            if len(tracks) == 0:
+                # Nothing associated yet, keep the raw detections without an ID
+                frame_detections = boxes_to_detections(boxes, names)
+                for detection in frame_detections:
+                    detection['track_id'] = -1
+            else:
+                xyxy = tracks[:, :4].tolist()
+                track_ids = tracks[:, 4].astype(int).tolist()
+                confidences = tracks[:, 5].tolist()
+                class_ids = tracks[:, 6].astype(int).tolist()
+                frame_detections = [
+                    {'class': names[class_id], 'confidence': confidence, 'bbox': bbox, 'track_id': track_id}
+                    for bbox, track_id, confidence, class_id in zip(xyxy, track_ids, confidences, class_ids)
+                ]
+            if scale != 1.0:
+                for detection in frame_detections:
+                    detection['bbox'] = [value * scale for value in detection['bbox']]
+            batch_detections.append(frame_detections)
+        return batch_detections
+
+    # source can be an image path or a BGR frame decoded in memory
+    def track_frame(self, source: Union[str, np.ndarray]) -> List[Dict]:
+        return self.track_frames([source])[0]
+
+    # Batches a stream of (index, timestamp, frame) tuples and yields them back with their detections
+    def track_stream(self, frames: Iterable[Tuple[int, float, np.ndarray]],
+                     scale: float = 1.0) -> Iterator[Tuple[int, float, np.ndarray, List[Dict]]]:
+        batch = []
+        for item in frames:
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                yield from self._track_batch(batch, scale)
+                batch = []
+        if batch:
+            yield from self._track_batch(batch, scale)
+
+    def _track_batch(self, batch: List[Tuple[int, float, np.ndarray]],
+                     scale: float = 1.0) -> Iterator[Tuple[int, float, np.ndarray, List[Dict]]]:
+        detections = self.track_frames([frame for _, _, frame in batch], scale)
+        for (frame_idx, timestamp, frame), frame_detections in zip(batch, detections):
+            yield frame_idx, timestamp, frame, frame_detections
 
     def track_in_frames(self, frame_paths: List[str]) -> Dict[str, List[Dict]]:
         results = {}
         print(f"Starting tracking on {len(frame_paths)} frames...")
-        for i, frame_path in enumerate(frame_paths):
-            tracking_results = self.model.track(
-                frame_path, 
-                conf=self.confidence_threshold,
-                persist=True, 
-                verbose=False,
-                tracker="botsort.yaml" 
-            )
-            
-            frame_detections = []
-            for result in tracking_results:
-                boxes = result.boxes
-                for box in boxes:
-
-                    track_id = int(box.id[0]) if box.id is not None else -1
-                    
-                    detection = {
-                        'class': result.names[int(box.cls[0])],
-                        'confidence': float(box.conf[0]),
-                        'bbox': box.xyxy[0].cpu().numpy().tolist(),
-                        'track_id': track_id
-                    }
-                    frame_detections.append(detection)
-            
-            results[frame_path] = frame_detections
-            
-            unique_ids = set(d['track_id'] for d in frame_detections if d['track_id'] != -1)
-            if (i + 1) % 10 == 0:
-                print(f"Tracked frame {i+1}/{len(frame_paths)} - Active Objects: {len(unique_ids)}")
+        for start in range(0, len(frame_paths), self.batch_size):
+            batch = frame_paths[start:start + self.batch_size]
+            for frame_path, frame_detections in zip(batch, self.track_frames(batch)):
+                results[frame_path] = frame_detections
+
+            unique_ids = set(d['track_id'] for d in results[batch[-1]] if d['track_id'] != -1)
+            print(f"Tracked frame {start + len(batch)}/{len(frame_paths)} - Active Objects: {len(unique_ids)}")
 
         print("Object tracking complete")
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,453 @@
+import functools
+import multiprocessing
+import os
+import numpy as np
+from contextlib import ExitStack
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.video_processor import fit_size, get_video_info, iter_frames, read_frames_at, save_frames
+from src.adaptive_sampling import DEFAULT_MAX_SAMPLE_RATE, DEFAULT_MIN_SAMPLE_RATE, iter_frames_adaptive
+from src.audio_processing import (
+    SAMPLE_RATE, detect_speech_regions, find_chunk_boundaries, group_speech_regions, load_audio,
+    merge_transcripts, speech_summary, video_has_audio
+)
+from src.data_integration import VideoAnalysisIntegrator
+from src.model_registry import registry
+from src.scene_detection import DEFAULT_SCENE_DETECTION_MODE, SceneChangeDetector
+from src.result_cache import result_cache
+from src.uploads import file_sha256
+from src.whisper_profiles import DECODE_OPTIONS, DEFAULT_WHISPER_PROFILE, whisper_profile
+
+DEFAULT_CONFIG = {
+    "tracker_model": "yolov8n.pt",
+    "confidence_threshold": 0.5,
+    # YOLO input resolution (long side); frames are downscaled to it once at decode time
+    "inference_size": 640,
+    "decode_downscale": True,
+    # Tiled mode keeps full resolution and runs inference_size tiles, for small objects in 4K footage
+    "tiled_inference": False,
+    "tile_overlap": 0.2,
+    "sample_rate": 1.0,
+    "sampling_strategy": "auto",
+    # Adaptive sampling varies the rate between min and max with on-screen motion, within frame_budget
+    "adaptive_sampling": False,
+    "min_sample_rate": DEFAULT_MIN_SAMPLE_RATE,
+    "max_sample_rate": DEFAULT_MAX_SAMPLE_RATE,
+    # Percentage of changed pixels between candidates at which max_sample_rate is reached
+    "motion_threshold": 1.0,
+    # Most frames the models see per video, None for no limit (adaptive sampling only)
+    "frame_budget": None,
+    "scene_detection_mode": DEFAULT_SCENE_DETECTION_MODE,
+    # None uses the mode's default threshold
+    "scene_threshold": None,
+    # Decoding speed/accuracy tradeoff, one of WHISPER_PROFILES; whisper_model overrides its model size
+    "whisper_profile": DEFAULT_WHISPER_PROFILE,
+    "whisper_model": None,
+    "clip_model": "ViT-B/32",
+    # None uses SceneAnalyzer's default prompt vocabulary
+    "clip_prompts": None,
+    "clip_batch_size": 32,
+    "save_keyframes": True,
+    # CLIP embeddings of every sampled frame, added to the cross-job search index when the job completes
+    "frame_embeddings": True,
+    # Cores given to each branch (per audio worker), None leaves torch's default
+    "visual_threads": None,
+    "audio_threads": None,
+    # Whisper processes transcribing chunks of one recording in parallel, each with its own model copy
+    "audio_workers": 2,
+    "audio_chunk_seconds": 120.0,
+    # None detects the language once from the first 30 seconds
+    "audio_language": None,
+    # Longer audio is decoded into a memory-mapped file in the job directory rather than RAM
+    "audio_memmap_seconds": 3600.0,
+    # Only transcribe the regions the voice activity detector finds speech in; silence and
+    # music-only audio then never reach Whisper. Speech closer together than
+    # speech_gap_seconds is transcribed in one piece, pauses included, for context.
+    "speech_filter": True,
+    "speech_gap_seconds": 5.0,
+    # Reuse stage results from earlier runs on the same file with the same settings
+    "use_result_cache": True,
+}
+
+# Config values each cached stage's output depends on. Scenes are built from the
+# visual pass, so they inherit its keys: changing only the CLIP prompts reuses
+# tracking and transcription. The visual pass embeds frames with the CLIP model.
+VISUAL_CACHE_KEYS = ("tracker_model", "confidence_threshold", "inference_size", "decode_downscale",
+                     "tiled_inference", "tile_overlap", "sample_rate", "sampling_strategy",
+                     "adaptive_sampling", "min_sample_rate", "max_sample_rate", "motion_threshold", "frame_budget",
+                     "scene_detection_mode", "scene_threshold", "frame_embeddings", "clip_model")
+STAGE_CACHE_KEYS = {
+    "visual": VISUAL_CACHE_KEYS,
+    "audio": ("whisper_profile", "whisper_model", "audio_chunk_seconds", "audio_language",
+              "speech_filter", "speech_gap_seconds"),
+    "scenes": VISUAL_CACHE_KEYS + ("clip_prompts",),
+}
+
+EMPTY_TRANSCRIPT = {'language': 'none', 'text': '', 'segments': []}
+
+
+def make_config(overrides: Optional[Dict] = None) -> Dict:
+    config = dict(DEFAULT_CONFIG)
+    config.update(overrides or {})
+    return config
+
+
+# Runs named stages as soon as the stages they depend on have finished.
+# Each stage runs on the executor it was assigned to and receives its
+# dependencies' results as keyword arguments.
+class StageScheduler:
+    def __init__(self, executors: Dict[str, Executor]):
+        self.executors = executors
+        self.stages: Dict[str, Dict] = {}
+
+    def add_stage(self, name: str, func: Callable, deps: Tuple[str, ...] = (), executor: str = "default", **kwargs) -> None:
+        if executor not in self.executors:
+            raise ValueError(f"Unknown executor for stage {name}: {executor}")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dep}")
+        self.stages[name] = {"func": func, "deps": deps, "executor": executor, "kwargs": kwargs}
+
+    def run(self, on_stage_done: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        running = {}
+        pending = dict(self.stages)
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage["deps"]):
+                    kwargs = dict(stage["kwargs"])
+                    kwargs.update({dep: results[dep] for dep in stage["deps"]})
+                    future = self.executors[stage["executor"]].submit(stage["func"], **kwargs)
+                    running[future] = name
+                    del pending[name]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    raise
+                if on_stage_done is not None:
+                    on_stage_done(name)
+        return results
+
+
+def limit_threads(num_threads: Optional[int]) -> None:
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+
+
+def init_audio_worker(num_threads: Optional[int], whisper: Optional[Dict]) -> None:
+    limit_threads(num_threads)
+    if whisper:
+        warmup_audio(whisper)
+
+
+_audio_pool = None
+_audio_pool_settings = None
+
+# Whisper runs in long-lived worker processes so each keeps its model loaded and its own cores.
+# Chunks of a long recording are transcribed on all of them at once. The pool is started again
+# when a worker process died (which breaks every later submit), when the thread or worker count
+# changes, or when asked to preload a different Whisper profile; whisper=None takes the pool as it is.
+def get_audio_pool(num_threads: Optional[int] = None, num_workers: int = 1,
+                   whisper: Optional[Dict] = None) -> ProcessPoolExecutor:
+    global _audio_pool, _audio_pool_settings
+    if _audio_pool is not None:
+        threads, workers, preloaded = _audio_pool_settings
+        if getattr(_audio_pool, "_broken", False):
+            print("An audio worker process died, starting a new audio pool")
+            shutdown_audio_pool()
+        elif (threads, workers) != (num_threads, num_workers) or (whisper is not None and whisper != preloaded):
+            shutdown_audio_pool()
+    if _audio_pool is None:
+        _audio_pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_audio_worker,
+            initargs=(num_threads, whisper)
+        )
+        _audio_pool_settings = (num_threads, num_workers, whisper)
+    return _audio_pool
+
+
+def shutdown_audio_pool() -> None:
+    global _audio_pool
+    if _audio_pool is not None:
+        _audio_pool.shutdown(cancel_futures=True)
+        _audio_pool = None
+
+
+def warmup_audio(whisper: Dict) -> None:
+    registry.warmup(tracker_model=None, whisper_model=whisper["model"], clip_model=None,
+                    whisper_quantize=whisper["quantize"])
+
+
+# Visual models load in this process, Whisper in every audio worker process as it starts
+def warmup_models(config: Optional[Dict] = None) -> None:
+    config = make_config(config)
+    registry.warmup(tracker_model=config["tracker_model"], whisper_model=None, clip_model=config["clip_model"])
+    pool = get_audio_pool(config["audio_threads"], config["audio_workers"], whisper_settings(config))
+    # Running a task makes the pool start its workers, which load Whisper in their initializer
+    for future in [pool.submit(limit_threads, config["audio_threads"]) for _ in range(config["audio_workers"])]:
+        future.result()
+
+
+def stage_cache_keys(content_hash: Optional[str], config: Dict) -> Dict[str, Optional[str]]:
+    if not config["use_result_cache"] or not content_hash:
+        return {stage: None for stage in STAGE_CACHE_KEYS}
+    return {
+        stage: result_cache.make_key(content_hash, stage, {key: config[key] for key in keys})
+        for stage, keys in STAGE_CACHE_KEYS.items()
+    }
+
+
+# Returns the cached result for cache_key if there is one, otherwise runs the stage and stores its result
+def run_cached(stage: str, func: Callable, cache_key: Optional[str], **kwargs) -> Any:
+    if cache_key is not None:
+        cached = result_cache.get(stage, cache_key)
+        if cached is not None:
+            print(f"Reusing cached {stage} results")
+            return cached
+    result = func(**kwargs)
+    # Skipped or failed transcriptions come back as EMPTY_TRANSCRIPT; they are cheap to redo and shouldn't stick
+    if cache_key is not None and result is not EMPTY_TRANSCRIPT:
+        result_cache.put(stage, cache_key, result)
+    return result
+
+
+# Decode, track and find scene cuts in a single pass over the sampled frames. on_progress gets
+# ("visual", frames tracked, frames expected) after every frame.
+def analyze_visual(video_path: str, config: Dict,
+                   on_progress: Optional[Callable[[str, float, float], None]] = None) -> Dict:
+    sampled_indices = []
+    timestamps = []
+    tracking_results = {}
+    embeddings = []
+    pending = []
+    detector = SceneChangeDetector(mode=config["scene_detection_mode"], threshold=config["scene_threshold"])
+    # Decode straight to the size YOLO would letterbox to; tiles need the full resolution
+    info = get_video_info(video_path)
+    max_size = config["inference_size"] if config["decode_downscale"] and not config["tiled_inference"] else None
+    decoded_width, _ = fit_size(info["width"], info["height"], max_size)
+    scale = info["width"] / decoded_width if decoded_width else 1.0
+    # Fixed-rate sampling knows how many frames it will take; for adaptive sampling the count
+    # is extrapolated from how far into the video the frames tracked so far reach
+    expected_frames = None if config["adaptive_sampling"] else max(int(info["duration"] * config["sample_rate"]), 1)
+    with ExitStack() as models:
+        tracker = models.enter_context(registry.tracker(
+            config["tracker_model"], confidence_threshold=config["confidence_threshold"],
+            imgsz=config["inference_size"], tiled=config["tiled_inference"], tile_overlap=config["tile_overlap"]
+        ))
+        # Frames are embedded while they are in memory anyway, batched like the scene keyframes
+        analyzer = models.enter_context(registry.scene_analyzer(config["clip_model"])) if config["frame_embeddings"] else None
+        if config["adaptive_sampling"]:
+            frames = iter_frames_adaptive(video_path, config["min_sample_rate"], config["max_sample_rate"],
+                                          config["frame_budget"], config["motion_threshold"], config["sampling_strategy"],
+                                          max_size)
+        else:
+            frames = iter_frames(video_path, config["sample_rate"], config["sampling_strategy"], max_size)
+        for frame_idx, timestamp, frame, detections in tracker.track_stream(frames, scale):
+            sampled_indices.append(frame_idx)
+            timestamps.append(timestamp)
+            tracking_results[frame_idx] = detections
+            detector.update(frame)
+            if on_progress is not None:
+                tracked = len(sampled_indices)
+                expected = expected_frames or int(tracked * info["duration"] / max(timestamp, 1e-3))
+                on_progress("visual", tracked, max(expected, tracked))
+            if analyzer is not None:
+                pending.append(frame)
+                if len(pending) == config["clip_batch_size"]:
+                    embeddings.append(analyzer.encode_images(pending).cpu().numpy().astype(np.float16))
+                    pending = []
+        if pending:
+            embeddings.append(analyzer.encode_images(pending).cpu().numpy().astype(np.float16))
+    return {
+        "sampled_indices": sampled_indices,
+        "timestamps": timestamps,
+        "tracking_results": tracking_results,
+        "boundaries": detector.boundaries,
+        # Normalized float16 CLIP embeddings, one row per sampled frame
+        "embeddings": np.concatenate(embeddings) if embeddings else None
+    }
+
+
+# Only keyframes are decoded again and written to disk. A keyframe that fails to seek or
+# decode (a keyframes-strategy index past the last decodable frame, VFR input) is left out.
+def load_keyframes(video_path: str, frames_dir: str, config: Dict, visual: Dict, scenes: List[Dict]) -> Dict:
+    sampled_indices = visual["sampled_indices"]
+    keyframe_sources = {scene['key_frame_index']: sampled_indices[scene['key_frame_index']] for scene in scenes}
+    decoded = read_frames_at(video_path, list(keyframe_sources.values()))
+    missing = sorted(set(keyframe_sources.values()) - set(decoded))
+    if missing:
+        print(f"Could not re-read keyframes at source frames {missing}")
+    if config["save_keyframes"]:
+        decoded = save_frames(decoded, frames_dir)
+    return {key: decoded[src] for key, src in keyframe_sources.items() if src in decoded}
+
+
+# on_progress gets ("scenes", scenes described, scenes) after every CLIP batch
+def describe_scenes(video_path: str, frames_dir: str, config: Dict, visual: Dict,
+                    cache_key: Optional[str] = None,
+                    on_progress: Optional[Callable[[str, float, float], None]] = None) -> List[Dict]:
+    if cache_key is not None:
+        scenes = result_cache.get("scenes", cache_key)
+        if scenes is not None:
+            print("Reusing cached scenes results")
+            # Keyframe paths in the cached copy belong to the job that produced it
+            if config["save_keyframes"]:
+                keyframes = load_keyframes(video_path, frames_dir, config, visual, scenes)
+                for scene in scenes:
+                    scene['key_frame_path'] = keyframes.get(scene['key_frame_index'])
+            return scenes
+    with registry.scene_analyzer(config["clip_model"]) as analyzer:
+        analyzer.batch_size = config["clip_batch_size"]
+        scenes = analyzer.build_scenes(visual["boundaries"], len(visual["sampled_indices"]))
+        keyframes = load_keyframes(video_path, frames_dir, config, visual, scenes)
+        # A scene without its keyframe can't be described, the rest of the analysis still can
+        skipped = [scene['scene_number'] for scene in scenes if scene['key_frame_index'] not in keyframes]
+        if skipped:
+            print(f"Skipping scenes {skipped}: their keyframes could not be re-read")
+            scenes = [scene for scene in scenes if scene['key_frame_index'] in keyframes]
+        report = None
+        if on_progress is not None:
+            on_progress("scenes", 0, len(scenes))
+            report = functools.partial(on_progress, "scenes")
+        scenes = analyzer.describe_scenes(scenes, keyframes, config["clip_prompts"], on_progress=report)
+    if cache_key is not None:
+        result_cache.put("scenes", cache_key, [dict(scene, key_frame_path=None) for scene in scenes])
+    return scenes
+
+
+# The job's Whisper profile, see src/whisper_profiles.py
+def whisper_settings(config: Dict) -> Dict:
+    return whisper_profile(config["whisper_profile"], config["whisper_model"])
+
+
+# Run inside the audio worker processes
+def detect_audio_language(whisper: Dict, samples) -> str:
+    with registry.transcriber(whisper["model"], whisper["quantize"]) as transcriber:
+        return transcriber.detect_language(samples)
+
+
+def transcribe_chunk(whisper: Dict, samples, language: Optional[str]) -> Dict:
+    with registry.transcriber(whisper["model"], whisper["quantize"]) as transcriber:
+        return transcriber.transcribe(samples, language, **{key: whisper[key] for key in DECODE_OPTIONS})
+
+
+# Only the stretches holding speech are transcribed, long ones cut at quiet points into
+# chunks that the audio workers transcribe in parallel. on_progress gets ("audio", seconds
+# transcribed, seconds of speech) as chunks finish.
+def transcribe_audio(video_path: str, work_dir: str, config: Dict,
+                     on_progress: Optional[Callable[[str, float, float], None]] = None) -> Dict:
+    if not video_has_audio(video_path):
+        print("No audio stream detected, skipping transcription")
+        return EMPTY_TRANSCRIPT
+    duration = get_video_info(video_path)["duration"]
+    # Past audio_memmap_seconds the decoded samples go to a memory-mapped file instead of RAM
+    memmap_path = os.path.join(work_dir, "audio.f32") if duration > config["audio_memmap_seconds"] else None
+    try:
+        samples = load_audio(video_path, expected_seconds=duration, memmap_path=memmap_path)
+        regions = detect_speech_regions(samples) if config["speech_filter"] else [(0, len(samples))]
+        speech = speech_summary(regions, len(samples))
+        print(f"Speech in {speech['speech_seconds']:.1f}s of {speech['audio_seconds']:.1f}s of audio ({speech['coverage']:.0%})")
+        if not regions:
+            print("No speech detected, skipping transcription")
+            return dict(EMPTY_TRANSCRIPT, speech=speech)
+        chunk_length = int(config["audio_chunk_seconds"] * SAMPLE_RATE)
+        chunks = []
+        for span_start, span_end in group_speech_regions(regions, chunk_length, int(config["speech_gap_seconds"] * SAMPLE_RATE)):
+            chunks.extend(
+                (span_start + start, span_start + end)
+                for start, end in find_chunk_boundaries(samples[span_start:span_end], config["audio_chunk_seconds"])
+            )
+        whisper = whisper_settings(config)
+        pool = get_audio_pool(config["audio_threads"], config["audio_workers"])
+        language = config["audio_language"]
+        if language is None and len(chunks) > 1:
+            # Detect from the first 30 seconds of speech rather than whatever the recording opens with
+            speech_samples = np.concatenate([samples[start:min(end, start + 30 * SAMPLE_RATE)] for start, end in chunks[:30]])
+            language = pool.submit(detect_audio_language, whisper, speech_samples[:30 * SAMPLE_RATE]).result()
+            print(f"Detected language: {language}")
+        speech_seconds = sum(end - start for start, end in chunks) / SAMPLE_RATE
+        print(f"Transcribing {speech_seconds:.1f}s of audio in {len(chunks)} chunk(s)")
+        if on_progress is not None:
+            on_progress("audio", 0, speech_seconds)
+        # Each chunk is copied to its worker as a plain array, Whisper takes it without decoding again
+        futures = {
+            pool.submit(transcribe_chunk, whisper, np.asarray(samples[start:end]), language): (start, end)
+            for start, end in chunks
+        }
+        parts = []
+        transcribed = 0
+        for future in as_completed(futures):
+            start, end = futures[future]
+            parts.append((start / SAMPLE_RATE, future.result()))
+            transcribed += end - start
+            if on_progress is not None:
+                on_progress("audio", transcribed / SAMPLE_RATE, speech_seconds)
+        return dict(merge_transcripts(parts, language), speech=speech)
+    except BrokenProcessPool as e:
+        # Not a problem with this audio: fail the job instead of completing it without a transcript,
+        # and let the next job start on a fresh pool
+        shutdown_audio_pool()
+        raise RuntimeError("A Whisper worker process died while transcribing (out of memory?)") from e
+    except Exception as e:
+        print(f"Audio processing failed: {str(e)}, continuing without audio")
+        return EMPTY_TRANSCRIPT
+    finally:
+        if memmap_path and os.path.exists(memmap_path):
+            os.remove(memmap_path)  # Cleanup
+
+
+# Runs the audio branch concurrently with the visual branch and joins both into one integrator
+def analyze_video(video_path: str, output_dir: str, config: Optional[Dict] = None,
+                  on_stage_done: Optional[Callable[[str], None]] = None,
+                  content_hash: Optional[str] = None,
+                  on_progress: Optional[Callable[[str, float, float], None]] = None) -> VideoAnalysisIntegrator:
+    config = make_config(config)
+    # Bad audio settings fail the job here rather than inside the audio branch, which survives errors
+    whisper_settings(config)
+    if config["audio_chunk_seconds"] < 1:
+        raise ValueError(f"audio_chunk_seconds must be at least 1, got {config['audio_chunk_seconds']}")
+    if config["use_result_cache"] and content_hash is None:
+        content_hash = file_sha256(video_path)
+    cache_keys = stage_cache_keys(content_hash, config)
+    frames_dir = Path(output_dir) / "frames"
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    limit_threads(config["visual_threads"])
+    # The audio thread only hands chunks to the audio worker processes and collects the results
+    with ThreadPoolExecutor(max_workers=2) as visual_pool, ThreadPoolExecutor(max_workers=1) as audio_thread:
+        scheduler = StageScheduler({
+            "visual": visual_pool,
+            "audio": audio_thread
+        })
+        scheduler.add_stage("metadata", get_video_info, executor="visual", video_path=video_path)
+        scheduler.add_stage("audio", functools.partial(run_cached, "audio", transcribe_audio, cache_keys["audio"]),
+                            executor="audio", video_path=video_path, work_dir=str(output_dir), config=config,
+                            on_progress=on_progress)
+        scheduler.add_stage("visual", functools.partial(run_cached, "visual", analyze_visual, cache_keys["visual"]),
+                            executor="visual", video_path=video_path, config=config, on_progress=on_progress)
+        scheduler.add_stage("scenes", describe_scenes, deps=("visual",), executor="visual",
+                            video_path=video_path, frames_dir=str(frames_dir), config=config,
+                            cache_key=cache_keys["scenes"], on_progress=on_progress)
+        results = scheduler.run(on_stage_done)
+
+    integrator = VideoAnalysisIntegrator()
+    integrator.add_video_metadata(results["metadata"])
+    visual = results["visual"]
+    integrator.add_frame_detections(visual["sampled_indices"], visual["tracking_results"],
+                                    visual["sampled_indices"], visual["timestamps"])
+    if visual.get("embeddings") is not None:
+        integrator.add_frame_embeddings(visual["embeddings"], config["clip_model"])
+    integrator.compute_tracks_summary()
+    integrator.add_audio_transcript(results["audio"])
+    integrator.add_scenes(results["scenes"])
+    integrator.generate_summary()
+    return integrator
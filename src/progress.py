@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Dict, Optional
+from src.job_store import JobStore
+
+# Share of the overall progress each pipeline stage accounts for; the first 10% is setup
+# and the last 5% export
+STAGE_WEIGHTS = {"metadata": 5, "visual": 40, "audio": 25, "scenes": 15}
+START_PROGRESS = 10
+# What done and total count in each stage's progress events
+STAGE_UNITS = {"visual": "frames", "audio": "seconds", "scenes": "scenes"}
+STAGE_MESSAGES = {
+    "visual": "Tracked {done}/{total} frames",
+    "audio": "Transcribed {done:.0f}/{total:.0f}s of speech",
+    "scenes": "Described {done}/{total} scenes"
+}
+STAGE_DONE_MESSAGES = {
+    "metadata": "Extracted video metadata",
+    "visual": "Object tracking complete, analyzing scenes with CLIP",
+    "audio": "Audio transcription complete",
+    "scenes": "Scene analysis complete"
+}
+
+
+# Turns the pipeline's progress callbacks into job events: each stage's done/total count,
+# its throughput since the stage started and the time left at that rate, plus the overall
+# percentage all stages add up to. Callbacks arrive per frame from the visual thread and
+# per chunk from the audio thread; within min_interval of a stage's last event they only
+# update the counts, so the job store sees a few writes a second however fast frames go.
+class JobProgress:
+    def __init__(self, store: JobStore, job_id: str, min_interval: float = 0.5):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.stages: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def overall(self) -> int:
+        progress = START_PROGRESS
+        for stage, weight in STAGE_WEIGHTS.items():
+            state = self.stages.get(stage)
+            if state is None:
+                continue
+            if state["finished"]:
+                progress += weight
+            elif state["total"]:
+                progress += weight * min(state["done"] / state["total"], 1.0)
+        return int(progress)
+
+    def update(self, stage: str, done: float, total: float) -> None:
+        with self._lock:
+            now = time.time()
+            state = self.stages.get(stage)
+            if state is None:
+                state = {"started": now, "done": done, "total": total, "emitted": 0.0, "finished": False}
+                self.stages[stage] = state
+            state["done"] = done
+            state["total"] = max(total, done)
+            if now - state["emitted"] < self.min_interval and done < total:
+                return
+            state["emitted"] = now
+            elapsed = now - state["started"]
+            rate = done / elapsed if elapsed > 0 and done > 0 else None
+            self._emit(stage, STAGE_MESSAGES[stage].format(done=done, total=state["total"]), {
+                "done": round(done, 2),
+                "total": round(state["total"], 2),
+                "unit": STAGE_UNITS[stage],
+                "rate": round(rate, 2) if rate else None,
+                "eta": round((state["total"] - done) / rate, 1) if rate else None
+            })
+
+    def stage_done(self, stage: str) -> None:
+        with self._lock:
+            state = self.stages.setdefault(stage, {"started": time.time(), "done": 0, "total": 0, "emitted": 0.0})
+            state["finished"] = True
+            self._emit(stage, STAGE_DONE_MESSAGES[stage], {"finished": True, "eta": 0})
+
+    # An event outside the stages: setup, export, indexing, and the final status
+    def message(self, message: str, progress: Optional[int] = None, **job_fields) -> None:
+        with self._lock:
+            self._emit(None, message, {}, progress, **job_fields)
+
+    def _emit(self, stage: Optional[str], message: str, details: Dict, progress: Optional[int] = None,
+              **job_fields) -> None:
+        progress = self.overall() if progress is None else progress
+        event = dict(details, stage=stage, message=message, progress=progress)
+        if "status" in job_fields:
+            event["status"] = job_fields["status"]
+        self.store.add_event(self.job_id, event, progress=progress, message=message, **job_fields)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, List, Optional, Tuple
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "models/result_cache")
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "2048"))
+# Bump when a stage's output format changes so old entries stop matching
+CACHE_VERSION = 4
+
+
+# Stage results stored on disk under a key derived from the video's content hash
+# and the config values the stage depends on. Least recently used entries are
+# evicted once the cache grows past max_bytes.
+class ResultCache:
+    def __init__(self, root: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def make_key(self, content_hash: str, stage: str, fingerprint: Dict) -> str:
+        payload = json.dumps(
+            {"version": CACHE_VERSION, "video": content_hash, "stage": stage, "config": fingerprint},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, f"{key}.pkl")
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        path = self._path(stage, key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            # The modification time doubles as the last-used time for eviction
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError) as e:
+            print(f"Dropping unreadable cache entry {path}: {str(e)}")
+            os.remove(path)
+            return None
+
+    def put(self, stage: str, key: str, value: Any) -> None:
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for stage in os.listdir(self.root):
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for name in os.listdir(stage_dir):
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(stage_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+result_cache = ResultCache()
@@ -1,122 +1,195 @@
 import clip 
 import torch
 import cv2
+import hashlib
+import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple, Iterable, Optional, Union
 from pathlib import Path
+from src.scene_detection import DEFAULT_SCENE_DETECTION_MODE, SceneChangeDetector, ImageSource
+
+TEXT_CACHE_DIR = os.getenv("CLIP_TEXT_CACHE", "models/clip_text_cache")
+
+DEFAULT_PROMPTS = [
+    # People activities
+    "people talking indoors",
+    "people talking outdoors",
+    "people working in an office",
+    "people exercising or playing sports",
+    "people eating or dining",
+    "people performing or presenting on stage",
+    "people shopping or in a store",
+    "a person speaking or giving a presentation",
+
+    # Settings
+    "an indoor scene with people",
+    "an outdoor scene with people",
+    "a crowded public space",
+    "a quiet indoor environment",
+    "an urban street scene",
+    "a natural outdoor environment",
+    "a professional workplace setting",
+    "a recreational or leisure activity",
+
+    # Events
+    "a social gathering or party",
+    "a business meeting or conference",
+    "a sports event or game",
+    "a performance or concert",
+    "a classroom or educational setting",
+    "a transportation scene with vehicles",
+
+    # Nature & Objects
+    "a landscape or nature scene",
+    "animals in their natural habitat",
+    "vehicles on a road or street",
+    "architecture or buildings",
+    "food or cooking",
+    "technology or electronics",
+
+    # Activities
+    "someone creating or making something",
+    "people traveling or commuting",
+    "a celebration or special event",
+    "daily life activities"
+]
+
+def load_pil(image: ImageSource) -> Image.Image:
+    if isinstance(image, str):
+        return Image.open(image)
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
 
 class SceneAnalyzer:
-    def __init__(self, model_name:str = 'ViT-B/32'):
+    def __init__(self, model_name:str = 'ViT-B/32', cache_dir: Optional[str] = TEXT_CACHE_DIR,
+                 batch_size: int = 32, preprocess_workers: int = 4):
         print(f"Loading CLIP model: {model_name}")
         self.device = "cpu"
+        self.model_name = model_name
         self.model, self.preprocess = clip.load(model_name, device = self.device)
+        self.cache_dir = cache_dir
+        self.text_cache: Dict[str, torch.Tensor] = {}
+        self.batch_size = batch_size
+        self.preprocess_workers = preprocess_workers
         print(f"CLIP model loaded on {self.device}")
 
-    def detect_scene_changes(self, frame_paths: List[str], threshold: float = 30.0) -> List[int]:
-        print(f"Detecting scene changesin {len(frame_paths)} frames")
-        scene_boundaries = [0]
-        prev_frame = None
-        for i, frame_path in enumerate(frame_paths):
-            frame = cv2.imread(frame_path, cv2.IMREAD_GRAYSCALE)
-            if prev_frame is not None:
-                diff = cv2.absdiff(prev_frame, frame)
-                mean_diff = np.mean(diff)
-                if mean_diff > threshold: 
-                    scene_boundaries.append()
-                    print(f"Scene change detected at frame {i} (diff: {mean_diff:.2f})")
-                prev_frame = frame
-        print(f"Found {len(scene_boundaries)} scenes")
-        return scene_boundaries
+    def prompt_set_key(self, prompts: List[str]) -> str:
+        return hashlib.sha256("\n".join([self.model_name] + list(prompts)).encode("utf-8")).hexdigest()
+
+    # Normalized prompt embeddings, computed once per model and prompt set and kept in memory and on disk
+    def get_text_features(self, prompts: List[str]) -> torch.Tensor:
+        key = self.prompt_set_key(prompts)
+        if key in self.text_cache:
+            return self.text_cache[key]
+        cache_path = os.path.join(self.cache_dir, f"{key}.npy") if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            text_features = torch.from_numpy(np.load(cache_path)).to(self.device)
+        else:
+            text_features = self.encode_texts(prompts)
+            if cache_path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, text_features.cpu().numpy())
+                os.replace(tmp_path, cache_path)
+        self.text_cache[key] = text_features
+        return text_features
+
+    # Normalized [N, D] text features in the same space as encode_images, e.g. search queries
+    def encode_texts(self, texts: List[str]) -> torch.Tensor:
+        text_tokens = clip.tokenize(texts, truncate=True).to(self.device)
+        with torch.no_grad():
+            text_features = self.model.encode_text(text_tokens).float()
+        return text_features / text_features.norm(dim=-1, keepdim=True)
+
+    # frames can be a list or a generator, so detection can run while frames are decoded
+    def detect_scene_changes(self, frames: Iterable[ImageSource], threshold: Optional[float] = None,
+                             mode: str = DEFAULT_SCENE_DETECTION_MODE) -> List[int]:
+        print(f"Detecting scene changes ({mode})")
+        detector = SceneChangeDetector(mode=mode, threshold=threshold)
+        for i, frame in enumerate(frames):
+            if detector.update(frame):
+                print(f"Scene change detected at frame {i}")
+        print(f"Found {len(detector.boundaries)} scenes")
+        return detector.boundaries
     
-    def describe_image(self, image_path:str, prompt_options: List[str] = None)-> Dict[str, float]:
+    # Preprocesses in a thread pool, then encodes in batches; returns normalized [N, D] features
+    # on_progress gets (images encoded, images) after every batch
+    def encode_images(self, images: List[ImageSource], batch_size: Optional[int] = None,
+                      on_progress: Optional[Callable[[int, int], None]] = None) -> torch.Tensor:
+        batch_size = batch_size or self.batch_size
+        features = []
+        with ThreadPoolExecutor(max_workers=self.preprocess_workers) as pool, torch.no_grad():
+            for start in range(0, len(images), batch_size):
+                image_inputs = pool.map(lambda image: self.preprocess(load_pil(image)), images[start:start + batch_size])
+                batch = torch.stack(list(image_inputs)).to(self.device)
+                batch_features = self.model.encode_image(batch).float()
+                features.append(batch_features / batch_features.norm(dim=-1, keepdim=True))
+                if on_progress is not None:
+                    on_progress(start + len(batch), len(images))
+        return torch.cat(features)
+
+    # Scores every image against every prompt with a single matrix multiply
+    def describe_images(self, images: List[ImageSource], prompt_options: List[str] = None,
+                        batch_size: Optional[int] = None,
+                        on_progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, float]]:
         if prompt_options is None: 
-            prompt_options = [
-            # People activities
-            "people talking indoors",
-            "people talking outdoors", 
-            "people working in an office",
-            "people exercising or playing sports",
-            "people eating or dining",
-            "people performing or presenting on stage",
-            "people shopping or in a store",
-            "a person speaking or giving a presentation",
-            
-            # Settings
-            "an indoor scene with people",
-            "an outdoor scene with people",
-            "a crowded public space",
-            "a quiet indoor environment",
-            "an urban street scene",
-            "a natural outdoor environment",
-            "a professional workplace setting",
-            "a recreational or leisure activity",
-            
-            # Events
-            "a social gathering or party",
-            "a business meeting or conference",
-            "a sports event or game",
-            "a performance or concert",
-            "a classroom or educational setting",
-            "a transportation scene with vehicles",
-            
-            # Nature & Objects
-            "a landscape or nature scene",
-            "animals in their natural habitat",
-            "vehicles on a road or street",
-            "architecture or buildings",
-            "food or cooking",
-            "technology or electronics",
-            
-            # Activities
-            "someone creating or making something",
-            "people traveling or commuting",
-            "a celebration or special event",
-            "daily life activities"
-        ]
-        image = Image.open(image_path)
-        image_input = self.preprocess(image).unsqueeze(0).to(self.device)
-        text_tokens = clip.tokenize(prompt_options).to(self.device)
-        with torch.no_grad():
-            image_features = self.model.encode_image(image_input)
-            text_features = self.model.encode_text(text_tokens)
-            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-            similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
-        results = {}
-        for i, prompt in enumerate(prompt_options):
-            results[prompt] = float(similarity[0, i])
-        results = dict(sorted(results.items(), key=lambda x: x[1], reverse=True))
-        return results
+            prompt_options = DEFAULT_PROMPTS
+        if not images:
+            return []
+        text_features = self.get_text_features(prompt_options)
+        image_features = self.encode_images(images, batch_size, on_progress)
+        similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1).cpu().numpy()
+        descriptions = []
+        for row in similarity:
+            order = np.argsort(-row)
+            descriptions.append({prompt_options[i]: float(row[i]) for i in order})
+        return descriptions
+
+    def describe_image(self, image: ImageSource, prompt_options: List[str] = None)-> Dict[str, float]:
+        return self.describe_images([image], prompt_options)[0]
     
-    def analyze_scenes(self, frame_paths: List[str], scene_threshold: float = 30.0) -> List[Dict]:
-        boundaries = self.detect_scene_changes(frame_paths, scene_threshold)
+    def build_scenes(self, boundaries: List[int], num_frames: int) -> List[Dict]:
         scenes = []
-        print(f"\nAnalyzing {len(boundaries)} scenes with CLIP")
         for i, start_idx in enumerate(boundaries):
             if i + 1 < len(boundaries):
                 end_idx = boundaries[i + 1] - 1
             else:
-                end_idx = len(frame_paths) - 1
-            key_frame_idx = (start_idx + end_idx) // 2
-            key_frame_path = frame_paths[key_frame_idx]
-            descriptions = self.describe_image(key_frame_path)
-            best_description = list(descriptions.keys())[0]
-            confidence = descriptions[best_description]
-            scene = {
+                end_idx = num_frames - 1
+            scenes.append({
                 'scene_number': i + 1,
                 'start_frame': start_idx,
                 'end_frame': end_idx,
-                'key_frame_index': key_frame_idx,
-                'key_frame_path': key_frame_path,
-                'description': best_description,
-                'confidence': confidence,
-                'all_descriptions': descriptions
-            }
-            scenes.append(scene)
-            print(f"Scene {i+1}: Frames {start_idx}-{end_idx}")
+                'key_frame_index': (start_idx + end_idx) // 2,
+                'key_frame_path': None
+            })
+        return scenes
+
+    # keyframes maps key_frame_index to an image path or an in-memory frame
+    def describe_scenes(self, scenes: List[Dict], keyframes: Dict[int, ImageSource],
+                        prompt_options: List[str] = None,
+                        on_progress: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+        print(f"\nAnalyzing {len(scenes)} scenes with CLIP")
+        images = [keyframes[scene['key_frame_index']] for scene in scenes]
+        all_descriptions = self.describe_images(images, prompt_options, on_progress=on_progress)
+        for scene, keyframe, descriptions in zip(scenes, images, all_descriptions):
+            if isinstance(keyframe, str):
+                scene['key_frame_path'] = keyframe
+            best_description = list(descriptions.keys())[0]
+            confidence = descriptions[best_description]
+            scene['description'] = best_description
+            scene['confidence'] = confidence
+            scene['all_descriptions'] = descriptions
+            print(f"Scene {scene['scene_number']}: Frames {scene['start_frame']}-{scene['end_frame']}")
             print(f"  Description: {best_description}")
             print(f"  Confidence: {confidence:.1%}")
             print()
         print("Scene analysis complete!")
         return scenes
+
+    def analyze_scenes(self, frame_paths: List[str], scene_threshold: Optional[float] = None, mode: str = DEFAULT_SCENE_DETECTION_MODE) -> List[Dict]:
+        boundaries = self.detect_scene_changes(frame_paths, scene_threshold, mode)
+        scenes = self.build_scenes(boundaries, len(frame_paths))
+        keyframes = {scene['key_frame_index']: frame_paths[scene['key_frame_index']] for scene in scenes}
+        return self.describe_scenes(scenes, keyframes)
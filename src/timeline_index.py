@@ -0,0 +1,78 @@
+import numpy as np
+from typing import Dict, List, Sequence
+
+TIMELINE_KINDS = ("tracks", "scenes", "speech", "frames")
+DEFAULT_WINDOW_KINDS = ("tracks", "scenes", "speech")
+
+
+# Static index over [start, end] intervals. Intervals up to max_length long are sorted by
+# start, so the ones overlapping a window all start within [window start - max_length,
+# window end] and two bisections bound them. The few longer than that (a track on screen
+# for the whole video) would widen that range for every query, so they sit in a separate
+# array that is checked in full. max_length is a high percentile of the lengths, which
+# keeps the long array small and the bisected range close to the actual overlap.
+class IntervalIndex:
+    def __init__(self, starts: Sequence[float], ends: Sequence[float], long_percentile: float = 95.0):
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        if len(starts) != len(ends):
+            raise ValueError(f"{len(starts)} interval starts for {len(ends)} ends")
+        lengths = ends - starts
+        self.max_length = float(np.percentile(lengths, long_percentile)) if len(lengths) else 0.0
+        short = lengths <= self.max_length
+        ids = np.arange(len(starts))
+        order = np.argsort(starts[short], kind="stable")
+        self.short_ids = ids[short][order]
+        self.short_starts = starts[short][order]
+        self.short_ends = ends[short][order]
+        self.long_ids = ids[~short]
+        self.long_starts = starts[~short]
+        self.long_ends = ends[~short]
+        self.starts = starts
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    # Positions, in the order the intervals were given, of those overlapping [start, end], by start time
+    def overlapping(self, start: float, end: float) -> np.ndarray:
+        lo = np.searchsorted(self.short_starts, start - self.max_length, side="left")
+        hi = np.searchsorted(self.short_starts, end, side="right")
+        ids = self.short_ids[lo:hi][self.short_ends[lo:hi] >= start]
+        if len(self.long_ids):
+            long_hits = self.long_ids[(self.long_starts <= end) & (self.long_ends >= start)]
+            if len(long_hits):
+                ids = np.concatenate((ids, long_hits))
+                ids = ids[np.argsort(self.starts[ids], kind="stable")]
+        return ids
+
+
+# Interval indexes over the tracks, scenes, speech segments and sampled frames of one
+# video's results, so a time window only touches the items that overlap it.
+# data is the integrator's data or results read back with load_results.
+class TimelineIndex:
+    def __init__(self, data: Dict):
+        tracks = [dict(track, track_id=int(track_id)) for track_id, track in data.get("tracks", {}).items()]
+        scenes = data.get("scenes", [])
+        speech = (data.get("audio") or {}).get("segments", [])
+        frames = data.get("frames", [])
+        self.items: Dict[str, List[Dict]] = {"tracks": tracks, "scenes": scenes, "speech": speech, "frames": frames}
+        self.indexes: Dict[str, IntervalIndex] = {
+            "tracks": IntervalIndex([t["first_appearance"] for t in tracks], [t["last_appearance"] for t in tracks]),
+            "scenes": IntervalIndex([s["start_time"] for s in scenes], [s["end_time"] for s in scenes]),
+            "speech": IntervalIndex([s["start"] for s in speech], [s["end"] for s in speech]),
+            # A sampled frame is a single instant
+            "frames": IntervalIndex([f["timestamp"] for f in frames], [f["timestamp"] for f in frames]),
+        }
+
+    # Items of each kind overlapping [start, end] seconds, ordered by start time
+    def window(self, start: float, end: float, kinds: Sequence[str] = DEFAULT_WINDOW_KINDS) -> Dict:
+        if start > end:
+            raise ValueError(f"Window start {start} is after its end {end}")
+        unknown = [kind for kind in kinds if kind not in TIMELINE_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown timeline kind: {', '.join(unknown)} (expected one of {', '.join(TIMELINE_KINDS)})")
+        result: Dict = {"start": start, "end": end}
+        for kind in kinds:
+            items = self.items[kind]
+            result[kind] = [items[i] for i in self.indexes[kind].overlapping(start, end)]
+        return result
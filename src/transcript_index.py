@@ -0,0 +1,154 @@
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+TRANSCRIPT_INDEX_DB = os.getenv("TRANSCRIPT_INDEX_DB", "data/transcripts.db")
+
+
+# Lowercased word tokens without diacritics, split the way FTS5's unicode61 tokenizer splits them
+def tokenize(text: str) -> List[str]:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return re.findall(r"\w+", "".join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+# Full-text index over the transcript segments of every completed job. Segments go in an
+# FTS5 table, so a lookup reads the posting lists of the query's terms instead of every
+# job's results, and the word timings Whisper produced go in a table keyed by segment to
+# place each hit on the exact word. Shared by the workers that add to it and the API.
+class TranscriptIndex:
+    def __init__(self, db_path: str = TRANSCRIPT_INDEX_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+                    text,
+                    job_id UNINDEXED,
+                    segment_id UNINDEXED,
+                    start UNINDEXED,
+                    end UNINDEXED,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS words (
+                    job_id TEXT NOT NULL,
+                    segment_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    word TEXT NOT NULL,
+                    start REAL,
+                    end REAL,
+                    PRIMARY KEY (job_id, segment_id, position)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexed_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    language TEXT,
+                    segments INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # audio is the integrator's audio section; a job already in the index is skipped
+    def add(self, job_id: str, audio: Dict) -> int:
+        segments = audio.get("segments", [])
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM indexed_jobs WHERE job_id = ?", (job_id,)).fetchone():
+                conn.execute("COMMIT")
+                print(f"Job {job_id} is already in the transcript index")
+                return 0
+            conn.executemany(
+                "INSERT INTO segments (text, job_id, segment_id, start, end) VALUES (?, ?, ?, ?, ?)",
+                [(segment["text"], job_id, i, segment["start"], segment["end"]) for i, segment in enumerate(segments)]
+            )
+            conn.executemany(
+                "INSERT INTO words (job_id, segment_id, position, word, start, end) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, i, position, word["word"], word["start"], word["end"])
+                    for i, segment in enumerate(segments)
+                    for position, word in enumerate(segment.get("words", []))
+                ]
+            )
+            conn.execute(
+                "INSERT INTO indexed_jobs (job_id, language, segments, indexed_at) VALUES (?, ?, ?, ?)",
+                (job_id, audio.get("language"), len(segments), time.time())
+            )
+            conn.execute("COMMIT")
+        print(f"Indexed {len(segments)} transcript segments of job {job_id}")
+        return len(segments)
+
+    # Start and end time of the first run of words spelling out the query tokens, if the
+    # segment has word timings
+    def _locate(self, conn: sqlite3.Connection, job_id: str, segment_id: int, tokens: List[str]) -> Optional[Dict]:
+        words = conn.execute(
+            "SELECT word, start, end FROM words WHERE job_id = ? AND segment_id = ? ORDER BY position",
+            (job_id, segment_id)
+        ).fetchall()
+        flat = [(token, i) for i, word in enumerate(words) for token in tokenize(word["word"])]
+        for offset in range(len(flat) - len(tokens) + 1):
+            if all(flat[offset + j][0] == token for j, token in enumerate(tokens)):
+                first, last = words[flat[offset][1]], words[flat[offset + len(tokens) - 1][1]]
+                return {"start": first["start"], "end": last["end"]}
+        return None
+
+    # Segments containing the query as a phrase (or every word of it, with phrase=False),
+    # best BM25 match first, each placed at the matching words when timings exist. Only the
+    # newest max_candidates matching segments are ranked, which caps the ranking work for a
+    # word said in every video; older matches are then left out and truncated is set. Reading
+    # the posting lists still grows with the index, so latency does too, just more slowly.
+    def search(self, query: str, limit: int = 20, job_id: Optional[str] = None, phrase: bool = True,
+               max_candidates: int = 2000) -> Dict:
+        tokens = tokenize(query)
+        if not tokens:
+            return {"hits": [], "truncated": False}
+        # Quoted tokens never parse as FTS5 operators
+        if phrase:
+            match = '"' + " ".join(tokens) + '"'
+        else:
+            match = " AND ".join(f'"{token}"' for token in tokens)
+        sql = "SELECT rowid, bm25(segments) AS rank FROM segments WHERE segments MATCH ?"
+        params = [match]
+        if job_id is not None:
+            sql += " AND job_id = ?"
+            params.append(job_id)
+        sql += " ORDER BY rowid DESC LIMIT ?"
+        params.append(max_candidates)
+        hits = []
+        with self._connect() as conn:
+            candidates = conn.execute(sql, params).fetchall()
+            for candidate in sorted(candidates, key=lambda row: row["rank"])[:limit]:
+                row = conn.execute("""
+                    SELECT job_id, segment_id, start, end, text, snippet(segments, 0, '[', ']', '...', 16) AS snippet
+                    FROM segments WHERE segments MATCH ? AND rowid = ?
+                """, (match, candidate["rowid"])).fetchone()
+                # Without a phrase, the hit is placed at the first query word
+                located = self._locate(conn, row["job_id"], row["segment_id"], tokens if phrase else tokens[:1])
+                hits.append({
+                    "job_id": row["job_id"],
+                    "segment_id": row["segment_id"],
+                    # Word-level time of the match, or the segment's when there are no word timings
+                    "start": located["start"] if located else row["start"],
+                    "end": located["end"] if located else row["end"],
+                    "segment_start": row["start"],
+                    "segment_end": row["end"],
+                    "text": row["text"],
+                    "snippet": row["snippet"],
+                    "score": round(-candidate["rank"], 4)
+                })
+        return {"hits": hits, "truncated": len(candidates) >= max_candidates}
@@ -0,0 +1,57 @@
+import fcntl
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def file_sha256(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_sha256(value: str) -> bool:
+    return bool(SHA256_PATTERN.match(value))
+
+
+# Uploads are stored under their content hash so identical files share one copy. The hash
+# becomes part of a path, so anything but a hex digest is refused.
+def content_path(upload_dir: Path, content_hash: str, filename: str) -> Path:
+    if not is_sha256(content_hash):
+        raise ValueError(f"Not a sha256 hex digest: {content_hash!r}")
+    return upload_dir / f"{content_hash}{Path(filename).suffix.lower()}"
+
+
+# Moves a finished upload into place, or drops it if the same content is already stored
+def commit_upload(temp_path: Path, upload_dir: Path, content_hash: str, filename: str) -> Tuple[Path, bool]:
+    final_path = content_path(upload_dir, content_hash, filename)
+    if final_path.exists():
+        os.remove(temp_path)
+        return final_path, True
+    os.replace(temp_path, final_path)
+    return final_path, False
+
+
+# Exclusive hold on an upload's part file, so two requests can't append to it at once.
+# Yields False instead of waiting when another request holds it.
+@contextmanager
+def lock_part(path: str) -> Iterator[bool]:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
@@ -1,8 +1,20 @@
 import cv2
-import numpy
+import numpy as np
 import os
+import queue
+import re
+import subprocess
+import threading
 from pathlib import Path
-from typing import Tuple, Optional, Dict
+from typing import Tuple, Optional, Dict, Iterator, List
+
+SAMPLING_STRATEGIES = ("read", "grab", "seek", "keyframes")
+# Codecs where every frame is a keyframe, so seeking never decodes extra frames
+INTRA_ONLY_CODECS = {"mjpg", "mjpa", "jpeg", "apcn", "apch", "apcs", "apco", "ap4h", "dvsd", "ffv1", "png "}
+# Containers whose index makes CAP_PROP_POS_FRAMES slow or inexact
+UNSEEKABLE_CONTAINERS = {".ts", ".mts", ".m2ts", ".mpg", ".mpeg", ".vob"}
+# Beyond this many frames between samples, seeking to the next keyframe beats grabbing every frame
+SEEK_MIN_INTERVAL = 120
 
 # Extract meta data from video
 def get_video_info(video_path:str) -> Dict[str, float]:
@@ -16,6 +28,8 @@ def get_video_info(video_path:str) -> Dict[str, float]:
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     duration = frame_count / fps if fps > 0 else 0
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    codec = "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).lower()
 
     cap.release()
     return {
@@ -23,33 +37,165 @@ def get_video_info(video_path:str) -> Dict[str, float]:
         'width': width,
         'height': height,
         'frame_count': frame_count,
-        'duration': duration
+        'duration': duration,
+        'codec': codec
     }
 
-def extract_frames(video_path: str, output_dir: str, sample_rate: float = 1.0) -> list:
+# Pick the cheapest way to reach every sampled frame for this container and codec
+def choose_sampling_strategy(video_path: str, info: Dict, sample_rate: float) -> str:
+    frame_interval = info["fps"] / sample_rate if info["fps"] > 0 else 1
+    if frame_interval < 2:
+        return "read"
+    if Path(video_path).suffix.lower() in UNSEEKABLE_CONTAINERS:
+        return "grab"
+    if info.get("codec") in INTRA_ONLY_CODECS or frame_interval >= SEEK_MIN_INTERVAL:
+        return "seek"
+    return "grab"
+
+# Size that fits within max_size on the long side, keeping the aspect ratio (what YOLO's
+# letterbox scales to before padding). Frames already small enough keep their size.
+def fit_size(width: int, height: int, max_size: Optional[int]) -> Tuple[int, int]:
+    if not max_size or max(width, height) <= max_size:
+        return width, height
+    scale = max_size / max(width, height)
+    return max(int(round(width * scale)), 1), max(int(round(height * scale)), 1)
+
+# Presentation time in seconds of the frame the capture just decoded. The container's
+# timestamps are right for variable frame rate video, where frame_idx / fps drifts.
+def frame_timestamp(cap: cv2.VideoCapture, frame_idx: int, fps: float) -> float:
+    pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_msec > 0 or frame_idx == 0:
+        return pos_msec / 1000.0
+    # Some backends don't report positions
+    return frame_idx / fps if fps > 0 else 0.0
+
+# Decode sampled frames straight from the capture as (source frame index, timestamp in seconds, frame) tuples.
+# "read" decodes and converts every frame, "grab" only converts the sampled ones,
+# "seek" jumps between samples and "keyframes" lets ffmpeg decode keyframes only.
+# With max_size, frames are shrunk to fit it as soon as they are decoded, so full
+# resolution frames never travel further down the pipeline.
+def iter_frames(video_path: str, sample_rate: float = 1.0, strategy: str = "auto",
+                max_size: Optional[int] = None) -> Iterator[Tuple[int, float, np.ndarray]]:
     info = get_video_info(video_path)
+    if strategy == "auto":
+        strategy = choose_sampling_strategy(video_path, info, sample_rate)
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+    size = fit_size(info["width"], info["height"], max_size)
+    if strategy == "keyframes":
+        yield from _iter_keyframes(video_path, info, sample_rate, size)
+        return
+    resize = size != (info["width"], info["height"])
     fps = info["fps"]
-    frame_count = info["frame_count"]
-    frame_interval = fps / sample_rate
-    os.makedirs(output_dir, exist_ok=True)
+    frame_interval = max(int(fps / sample_rate), 1) if fps > 0 else 1
     cap = cv2.VideoCapture(video_path)
-    frame_paths = []
     frame_idx = 0
-    saved_count = 0
+    try:
+        while cap.isOpened():
+            sampled = frame_idx % frame_interval == 0
+            # Seeking past the end can land back on the last keyframe instead of failing
+            if strategy == "seek" and info["frame_count"] > 0 and frame_idx >= info["frame_count"]:
+                break
+            if strategy == "seek" and sampled and frame_idx > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            if sampled or strategy == "read":
+                ret, frame = cap.read()
+            else:
+                ret, frame = cap.grab(), None
+            if not ret:
+                break
+            if sampled:
+                if resize:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                yield frame_idx, frame_timestamp(cap, frame_idx, fps), frame
+            frame_idx += frame_interval if strategy == "seek" else 1
+    finally:
+        cap.release()
+
+def _iter_keyframes(video_path: str, info: Dict, sample_rate: float,
+                    size: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, float, np.ndarray]]:
+    fps = info["fps"]
+    width, height = size or (info["width"], info["height"])
+    interval = 1.0 / sample_rate
+    # ffmpeg scales after selecting, so only the kept keyframes are resized
+    scale = f",scale={width}:{height}:flags=area" if (width, height) != (info["width"], info["height"]) else ""
+    command = [
+        'ffmpeg',
+        '-skip_frame', 'nokey',
+        '-i', video_path,
+        '-an',
+        '-vf', f"select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{interval})'{scale},showinfo",
+        '-vsync', 'vfr',
+        '-f', 'rawvideo',
+        '-pix_fmt', 'bgr24',
+        '-'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # showinfo reports each output frame's pts on stderr before the frame is written
+    timestamps = queue.Queue()
+    def read_timestamps():
+        for line in iter(process.stderr.readline, b''):
+            match = re.search(rb'pts_time:([0-9.]+)', line)
+            if match:
+                timestamps.put(float(match.group(1)))
+    reader = threading.Thread(target=read_timestamps, daemon=True)
+    reader.start()
+    frame_size = width * height * 3
+    try:
+        while True:
+            data = process.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            timestamp = timestamps.get(timeout=10)
+            frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+            yield int(round(timestamp * fps)), timestamp, frame
+    finally:
+        process.kill()
+        process.wait()
+
+# Re-decode a handful of frames (e.g. scene keyframes) by seeking to their source index
+def read_frames_at(video_path: str, frame_indices: List[int]) -> Dict[int, np.ndarray]:
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    frames = {}
+    try:
+        for frame_idx in sorted(set(frame_indices)):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if ret:
+                frames[frame_idx] = frame
+    finally:
+        cap.release()
+    return frames
+
+def save_frames(frames: Dict[int, np.ndarray], output_dir: str, prefix: str = "Keyframe") -> Dict[int, str]:
+    os.makedirs(output_dir, exist_ok=True)
+    frame_paths = {}
+    for frame_idx, frame in frames.items():
+        frame_path = os.path.join(output_dir, f"{prefix}_{frame_idx:06d}.jpg")
+        cv2.imwrite(frame_path, frame)
+        frame_paths[frame_idx] = frame_path
+    return frame_paths
+
+# With return_times the source frame index and presentation time of every saved frame are
+# returned too, as (frame_paths, frame_indices, timestamps), so results can be placed on the real timeline
+def extract_frames(video_path: str, output_dir: str, sample_rate: float = 1.0, strategy: str = "auto",
+                   return_times: bool = False):
+    os.makedirs(output_dir, exist_ok=True)
+    frame_paths = []
+    frame_indices = []
+    timestamps = []
     print(f"Extracting frames at {sample_rate} fps")
-    print(f"Frame interval: {frame_interval:.2f}")
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if frame_idx % int(frame_interval)== 0:
-            frame_filename = f"Frame_{saved_count:04d}.jpg"
-            frame_path = os.path.join(output_dir, frame_filename)
-            cv2.imwrite(frame_path, frame)
-            frame_paths.append(frame_path)
-            saved_count += 1
-            print(f"Saved frame {saved_count} at index {frame_idx}")
-        frame_idx += 1
-    cap.release()
-    print(f"Extracted {saved_count} frames to {output_dir}")
+    for frame_idx, timestamp, frame in iter_frames(video_path, sample_rate, strategy):
+        frame_filename = f"Frame_{len(frame_paths):04d}.jpg"
+        frame_path = os.path.join(output_dir, frame_filename)
+        cv2.imwrite(frame_path, frame)
+        frame_paths.append(frame_path)
+        frame_indices.append(frame_idx)
+        timestamps.append(timestamp)
+        print(f"Saved frame {len(frame_paths)} at index {frame_idx} ({timestamp:.2f}s)")
+    print(f"Extracted {len(frame_paths)} frames to {output_dir}")
+    if return_times:
+        return frame_paths, frame_indices, timestamps
     return frame_paths
@@ -0,0 +1,50 @@
+from typing import Dict, Optional
+
+# Named Whisper speed/accuracy tradeoffs, picked per job with the whisper_profile setting.
+#   model           Whisper model size
+#   beam_size       beam search width at temperature 0, None decodes greedily
+#   best_of         candidates sampled at each fallback temperature above 0
+#   temperature     temperatures tried in turn when a window's decode looks like a failure
+#                   (repetitive or low log probability); a single value never falls back
+#   word_timestamps per-word times, which cost an extra cross-attention alignment pass
+#   quantize        int8 dynamic quantization of the Linear layers, only applied on CPU
+# "balanced" is how transcripts were always produced.
+DEFAULT_WHISPER_PROFILE = "balanced"
+WHISPER_PROFILES: Dict[str, Dict] = {
+    "fast": {
+        "model": "base",
+        "beam_size": None,
+        "best_of": None,
+        "temperature": 0.0,
+        "word_timestamps": False,
+        "quantize": True,
+    },
+    "balanced": {
+        "model": "base",
+        "beam_size": None,
+        "best_of": None,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "word_timestamps": True,
+        "quantize": False,
+    },
+    "accurate": {
+        "model": "small",
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "word_timestamps": True,
+        "quantize": False,
+    },
+}
+
+# Profile entries passed to AudioTranscriber.transcribe
+DECODE_OPTIONS = ("beam_size", "best_of", "temperature", "word_timestamps")
+
+# The named profile, with model swapped for another size when given
+def whisper_profile(name: str = DEFAULT_WHISPER_PROFILE, model: Optional[str] = None) -> Dict:
+    if name not in WHISPER_PROFILES:
+        raise ValueError(f"Unknown Whisper profile: {name} (expected one of {', '.join(WHISPER_PROFILES)})")
+    profile = dict(WHISPER_PROFILES[name])
+    if model:
+        profile["model"] = model
+    return profile
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from src.data_integration import VideoAnalysisIntegrator
+from src.frame_index import FrameIndex
+from src.job_store import JobStore
+from src.progress import START_PROGRESS, JobProgress
+from src.transcript_index import TranscriptIndex
+
+
+# A failure here leaves the job's results intact, it just won't show up in /search
+def index_frames(job_id: str, integrator: VideoAnalysisIntegrator) -> None:
+    try:
+        FrameIndex(model_name=integrator.embedding_model).add(job_id, integrator.frame_embeddings, integrator.frame_times())
+    except Exception as e:
+        print(f"Frame indexing failed for job {job_id}: {str(e)}")
+
+
+def index_transcript(job_id: str, integrator: VideoAnalysisIntegrator) -> None:
+    try:
+        TranscriptIndex().add(job_id, integrator.data["audio"])
+    except Exception as e:
+        print(f"Transcript indexing failed for job {job_id}: {str(e)}")
+
+
+def process_job(store: JobStore, job: Dict, output_dir: str) -> None:
+    from src.pipeline import analyze_video
+    job_id = job["job_id"]
+    progress = JobProgress(store, job_id)
+    try:
+        progress.message("Starting analysis", progress=5)
+        job_output_dir = Path(output_dir) / job_id
+        job_output_dir.mkdir(parents=True, exist_ok=True)
+        progress.message("Tracking objects and transcribing audio in parallel", progress=START_PROGRESS)
+        # Audio and visual branches report and finish in either order
+        integrator = analyze_video(job["file_path"], str(job_output_dir), job["config"], progress.stage_done,
+                                   job.get("content_hash"), progress.update)
+        progress.message("Exporting results", progress=95)
+        result_path = job_output_dir / "analysis_results.json"
+        integrator.export(str(result_path), str(job_output_dir / "detections.npz"))
+        if integrator.frame_embeddings is not None:
+            progress.message("Indexing frames for search", progress=95)
+            index_frames(job_id, integrator)
+        if integrator.data["audio"].get("segments"):
+            progress.message("Indexing transcript for search", progress=95)
+            index_transcript(job_id, integrator)
+        progress.message(
+            "Analysis complete!",
+            progress=100,
+            status="completed",
+            result_path=str(result_path),
+            completion_time=datetime.now().isoformat()
+        )
+    except Exception as e:
+        progress.message(f"Analysis failed: {str(e)}", status="failed", error=str(e))
+    # Clients that missed the run still get each stage's final state and the outcome
+    try:
+        store.compact_events(job_id)
+    except Exception as e:
+        print(f"Compacting events failed for job {job_id}: {str(e)}")
+
+
+def worker_main(db_path: str, output_dir: str, poll_interval: float, warmup: bool) -> None:
+    from src.pipeline import shutdown_audio_pool, warmup_models
+    # Exit through the normal path on terminate so the audio process is shut down too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    store = JobStore(db_path)
+    try:
+        if warmup:
+            warmup_models()
+        while True:
+            job = store.claim_next(os.getpid())
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            print(f"Worker {os.getpid()} processing job {job['job_id']}")
+            process_job(store, job, output_dir)
+    finally:
+        shutdown_audio_pool()
+
+
+# Keeps num_workers analysis processes running and recovers the jobs of any that die
+class WorkerPool:
+    def __init__(self, db_path: str, output_dir: str, num_workers: int = 1,
+                 poll_interval: float = 1.0, max_attempts: int = 3, warmup: bool = False):
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.warmup = warmup
+        self.store = JobStore(db_path)
+        self.context = multiprocessing.get_context("spawn")
+        self.workers: List[multiprocessing.Process] = []
+        self._stopping = threading.Event()
+        self._supervisor = None
+
+    def _spawn(self) -> multiprocessing.Process:
+        # Not a daemon: workers start their own audio process
+        process = self.context.Process(
+            target=worker_main,
+            args=(self.db_path, self.output_dir, self.poll_interval, self.warmup),
+            daemon=False
+        )
+        process.start()
+        return process
+
+    def start(self) -> None:
+        # Nothing can be running yet, so anything left in processing was cut off by a crash
+        recovered = self.store.requeue_in_flight(max_attempts=self.max_attempts)
+        if recovered:
+            print(f"Recovered {recovered} in-flight job(s)")
+        # Jobs that finished before an upgrade, or that a worker crash failed, still hold every event
+        compacted = self.store.compact_events()
+        if compacted:
+            print(f"Deleted {compacted} progress event(s) of finished jobs")
+        self.workers = [self._spawn() for _ in range(self.num_workers)]
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        print(f"Started {self.num_workers} worker process(es)")
+
+    def _supervise(self) -> None:
+        while not self._stopping.wait(self.poll_interval * 5):
+            for i, process in enumerate(self.workers):
+                if process.is_alive():
+                    continue
+                print(f"Worker {process.pid} exited with code {process.exitcode}, restarting")
+                self.store.requeue_in_flight([process.pid], max_attempts=self.max_attempts)
+                self.workers[i] = self._spawn()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        for process in self.workers:
+            process.terminate()
+        for process in self.workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
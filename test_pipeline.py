@@ -19,13 +19,13 @@ print(f"FPS: {video_info['fps']:.2f}")
 print()
 print("Extracting frames...")
 frames_dir = f"{output_base}/frames"
-frame_paths = extract_frames(video_path, frames_dir, sample_rate=1.0)
+frame_paths, frame_indices, timestamps = extract_frames(video_path, frames_dir, sample_rate=1.0, return_times=True)
 print(f"Extracted {len(frame_paths)} frames")
 print()
 print("Running object detection and tracking")
 tracker = ObjectTracker(model_name='yolov8n.pt', confidence_threshold=0.5)
 tracking_results = tracker.track_in_frames(frame_paths)
-integrator.add_frame_detections(frame_paths, tracking_results)
+integrator.add_frame_detections(frame_paths, tracking_results, frame_indices, timestamps)
 integrator.compute_tracks_summary()
 print(f"Tracked {len(integrator.data['tracks'])} unique objects")
 print()